@@ -0,0 +1,17 @@
+"""
+FastAPI endpoint готовности приложения и прогрева.
+"""
+from fastapi import APIRouter
+from ..core.dependencies import client
+from ..services.warmup import WarmupService
+from ..schemas.health import HealthStatus
+
+router = APIRouter()
+
+@router.get("", response_model=HealthStatus)
+async def get_health():
+    """
+    Готовность (приложение запущено) и ход фонового прогрева с длительностью каждого шага.
+    Не обращается к Telegram.
+    """
+    return WarmupService.status(client)
@@ -0,0 +1,51 @@
+"""
+FastAPI endpoints для истории, импортированной из экспорта Telegram Desktop.
+Сам импорт запускается из консоли: python -m src.services.importer /path/to/result.json
+"""
+import mimetypes
+import os
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import FileResponse
+from typing import List
+from ..core.dependencies import get_telegram_client
+from ..repositories.imports import ImportRepository
+from ..services.importer import ImportService
+from ..schemas.imports import ImportedChat, ImportReconcileResult
+from ..schemas.telegram import Message
+
+router = APIRouter()
+
+@router.get("/chats", response_model=List[ImportedChat])
+async def get_imported_chats():
+    """Чаты, загруженные из экспорта."""
+    return ImportRepository.chats()
+
+@router.get("/chats/{chat_id}/messages", response_model=List[Message])
+async def get_imported_messages(
+    chat_id: int,
+    limit: int = Query(20, ge=1, le=100, description="Number of messages to retrieve"),
+    offset_id: int = Query(0, description="Offset message ID to fetch older messages"),
+):
+    """
+    Импортированные сообщения чата в том же формате, что и /telegram/chats/{chat_id}/messages.
+    """
+    return [ImportService.to_message(row) for row in ImportRepository.messages(chat_id, limit, offset_id)]
+
+@router.get("/media/{chat_id}/{message_id}")
+async def get_imported_media(chat_id: int, message_id: int):
+    """Медиафайл импортированного сообщения прямо из папки экспорта."""
+    row = ImportRepository.message(chat_id, message_id)
+    if not row or not row["media_path"] or not os.path.isfile(row["media_path"]):
+        raise HTTPException(status_code=404, detail="Media not found")
+    content_type = row["mime_type"] or mimetypes.guess_type(row["media_path"])[0] or "application/octet-stream"
+    return FileResponse(row["media_path"], media_type=content_type, headers={"Cache-Control": "public, max-age=86400"})
+
+@router.post("/chats/{chat_id}/reconcile", response_model=ImportReconcileResult)
+async def reconcile_imported_chat(chat_id: int, tg_client = Depends(get_telegram_client)):
+    """
+    Сверить импортированный чат с Telegram: существует ли он и какие сообщения удалены после экспорта.
+    """
+    try:
+        return await ImportService.reconcile(tg_client, chat_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -0,0 +1,50 @@
+"""
+FastAPI endpoints для Notes extractor.
+"""
+import time
+from fastapi import APIRouter, Depends, Query, HTTPException
+from typing import List, Optional
+from ..core.dependencies import get_telegram_client
+from ..repositories.notes import NotesRepository
+from ..services.notes import NotesPipeline
+from ..schemas.notes import Note, NotesPipelineStats, NotesBackfillResult
+
+router = APIRouter()
+
+@router.get("", response_model=List[Note])
+async def get_notes(
+    chat_id: Optional[int] = Query(None, description="Только заметки из этого чата"),
+    include_done: bool = Query(False, description="Включать выполненные заметки"),
+    due_only: bool = Query(False, description="Только заметки, время напоминания которых наступило"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Получить сохранённые заметки (новые сверху).
+    """
+    return NotesRepository.list(chat_id, include_done, int(time.time()) if due_only else None, limit)
+
+@router.post("/{note_id}/done")
+async def mark_note_done(note_id: int):
+    """Отметить заметку выполненной."""
+    if not NotesRepository.mark_done(note_id):
+        raise HTTPException(status_code=404, detail="Note not found")
+    return {"status": "ok"}
+
+@router.get("/stats", response_model=NotesPipelineStats)
+async def get_notes_stats():
+    """Счётчики конвейера: полученные сообщения, кандидаты после локального фильтра, вызовы LLM."""
+    return NotesPipeline.stats()
+
+@router.post("/backfill/{chat_id}", response_model=NotesBackfillResult)
+async def backfill_notes(
+    chat_id: int,
+    limit: int = Query(500, ge=1, le=5000, description="Сколько последних сообщений прогнать через конвейер"),
+    tg_client = Depends(get_telegram_client)
+):
+    """
+    Прогнать историю чата через Notes extractor. Классификация идёт в фоне пачками.
+    """
+    try:
+        return await NotesPipeline.backfill(tg_client, chat_id, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
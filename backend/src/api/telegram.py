@@ -2,17 +2,50 @@
 FastAPI endpoints для Telegram API.
 """
 import re
-from fastapi import APIRouter, Depends, Query, HTTPException, Body, Header
+from fastapi import APIRouter, Depends, Query, HTTPException, Body, Header, Response
 from fastapi.responses import StreamingResponse, FileResponse
 import io
 import os
 from ..core.dependencies import get_telegram_client
 from ..services.telegram import TelegramService
-from ..schemas.telegram import Chat, ChatType, CognitiveApproach, CommunicationStyle, DominantStyle, ExpressionOfOpinions, InformationProcessingHint, Interest, LearningIndicator, LinguisticMarkers, Message, ChatStats, AuthRequestCode, AuthSubmitCode, AuthStatus, PersonaChange, PersonaMirror, PersonalExpression, PhoneCodeHash, ProblemSolvingTendencies, UserProfileInsights, ValueMotivator, ChatSummary
+from ..services.analytics import ChatAnalyticsService
+from ..services.prompt_encoder import PROMPT_ENCODERS
+from ..services.digest import DigestService
+from ..services.scheduler import PrecomputeScheduler, SUMMARY_TARGET, PERSONA_TARGET_PREFIX
+from ..services.versions import VersionRegistry
+from ..services.images import ImageVariantService
+from ..schemas.telegram import Chat, ChatType, CognitiveApproach, CommunicationStyle, DominantStyle, ExpressionOfOpinions, InformationProcessingHint, Interest, LearningIndicator, LinguisticMarkers, Message, ChatStats, AuthRequestCode, AuthSubmitCode, AuthStatus, PersonaChange, PersonaMirror, PersonalExpression, PhoneCodeHash, ProblemSolvingTendencies, UserProfileInsights, PersonaMirrorResult, ValueMotivator, ChatSummary, ChatAnalytics, NewsDigest, SummaryMode, PrecomputeStatus, ImageFormat
 from typing import List, Optional, Dict
 
 router = APIRouter()
 
+def _check_prompt_encoder(encoder: Optional[str]):
+    if encoder is not None and encoder not in PROMPT_ENCODERS:
+        raise HTTPException(status_code=400, detail=f"Unknown encoder '{encoder}'. Available: {', '.join(PROMPT_ENCODERS)}")
+
+def _not_modified(etag: Optional[str], if_none_match: Optional[str], response: Response) -> Optional[Response]:
+    """304 без тела, если клиент прислал актуальный ETag; иначе проставляет ETag в ответ."""
+    if VersionRegistry.not_modified(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return None
+
+async def _image_variant(render) -> FileResponse:
+    """Отдаёт вариант изображения; имя файла включает id медиа и размер, поэтому ETag строгий."""
+    try:
+        file_path, content_type = await render
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Failed to download media")
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=415, detail=f"Cannot render image variant: {e}")
+    headers = {
+        "Cache-Control": "public, max-age=86400",
+        "ETag": f'"{os.path.splitext(os.path.basename(file_path))[0]}"',
+    }
+    return FileResponse(file_path, media_type=content_type, headers=headers)
+
 @router.get("/chats", response_model=Dict[str, object])
 async def get_chats(
     filter_type: Optional[ChatType] = Query(ChatType.ALL, description="Filter chats by type"),
@@ -21,11 +54,18 @@ async def get_chats(
     offset_date: Optional[int] = Query(None, description="Offset date (unix timestamp) for pagination"),
     offset_peer_type: Optional[str] = Query(None, description="Offset peer type (user, chat, channel) for pagination"),
     offset_peer_id: Optional[int] = Query(None, description="Offset peer ID for pagination"),
+    if_none_match: Optional[str] = Header(None),
+    response: Response = None,
     tg_client = Depends(get_telegram_client)
 ):
     """
     Получить список чатов Telegram с фильтрацией по типу, пагинацией и статистику непрочитанных.
+    Поддерживает If-None-Match: пока список диалогов не менялся, отвечает 304 без обращения к Telegram.
     """
+    etag = VersionRegistry.dialogs_etag(filter_type, limit, offset_id, offset_date, offset_peer_type, offset_peer_id)
+    not_modified = _not_modified(etag, if_none_match, response)
+    if not_modified:
+        return not_modified
     chats, next_offset = await TelegramService.get_chats(
         tg_client, filter_type, limit, offset_id, offset_date, offset_peer_type, offset_peer_id
     )
@@ -37,12 +77,23 @@ async def get_chat_messages(
     chat_id: int,
     limit: int = Query(20, ge=1, le=100, description="Number of messages to retrieve"),
     offset_id: Optional[int] = Query(0, description="Offset message ID to fetch older messages"),
+    if_none_match: Optional[str] = Header(None),
+    response: Response = None,
     tg_client = Depends(get_telegram_client)
 ):
     """
     Получить последние N сообщений из чата.
+    Поддерживает If-None-Match: пока в чате нет новых, изменённых или прочитанных сообщений, отвечает 304.
     """
-    return await TelegramService.get_chat_messages(tg_client, chat_id, limit, offset_id)
+    etag = VersionRegistry.chat_etag(chat_id, "messages", limit, offset_id)
+    not_modified = _not_modified(etag, if_none_match, response)
+    if not_modified:
+        return not_modified
+    messages = await TelegramService.get_chat_messages(tg_client, chat_id, limit, offset_id)
+    if etag is None and not offset_id and messages:
+        # Версия чата неизвестна до первой полной выдачи; ETag появится со следующего запроса
+        VersionRegistry.observe_chat(chat_id, max(m.id for m in messages))
+    return messages
 
 @router.post("/chats/{chat_id}/send_message")
 async def send_message(
@@ -62,11 +113,15 @@ async def send_message(
 async def download_media(
     chat_id: int,
     message_id: int,
+    w: Optional[int] = Query(None, ge=16, le=2560, description="Ширина варианта изображения в пикселях"),
+    image_format: Optional[ImageFormat] = Query(None, alias="format", description="Формат варианта изображения"),
     range_header: Optional[str] = Header(None, alias="Range"),
     tg_client = Depends(get_telegram_client)
 ):
     """
     Optimized download media endpoint with caching, range support, and faster Telethon parameters.
+    С ?w= / ?format= для фото, статичных стикеров и картинок отдаёт уменьшенный вариант
+    (по возможности из встроенной миниатюры Telegram) вместо оригинала.
     """
     import tempfile
     tmp_dir = tempfile.gettempdir()
@@ -74,6 +129,10 @@ async def download_media(
     msg = await tg_client.get_messages(entity, ids=message_id)
     if not msg or not (msg.photo or msg.document or msg.sticker or msg.voice):
         raise HTTPException(status_code=404, detail="Media not found")
+    if w or image_format:
+        if not ImageVariantService.is_image(msg):
+            raise HTTPException(status_code=400, detail="Variants are only available for photos, static stickers and images")
+        return await _image_variant(ImageVariantService.media_variant(tg_client, msg, w, image_format))
     # Remove part_size_kb and workers for compatibility
     file_path = await tg_client.download_media(
         msg,
@@ -85,12 +144,11 @@ async def download_media(
     # Determine content type
     if msg.photo:
         content_type = "image/jpeg"
-    elif msg.sticker:
-        content_type = "image/webp"
+    elif msg.file and msg.file.mime_type:
+        # Стикеры бывают webp, tgs и webm, документы — любого типа
+        content_type = msg.file.mime_type
     elif msg.voice:
         content_type = "audio/ogg"
-    elif msg.document:
-        content_type = "application/octet-stream"
     else:
         content_type = "application/octet-stream"
     # Headers for caching and range support
@@ -137,11 +195,18 @@ async def auth_logout(tg_client = Depends(get_telegram_client)):
 
 
 @router.get("/chat_avatar/{chat_id}")
-async def get_chat_avatar(chat_id: int, tg_client = Depends(get_telegram_client)):
+async def get_chat_avatar(
+    chat_id: int,
+    w: Optional[int] = Query(None, ge=16, le=640, description="Ширина варианта аватарки в пикселях"),
+    image_format: Optional[ImageFormat] = Query(None, alias="format", description="Формат варианта аватарки"),
+    tg_client = Depends(get_telegram_client)
+):
     """Get chat/group/channel avatar thumbnail with caching headers."""
     entity = await tg_client.get_entity(chat_id)
     if not getattr(entity, 'photo', None):
         raise HTTPException(status_code=404, detail="No avatar")
+    if w or image_format:
+        return await _image_variant(ImageVariantService.avatar_variant(tg_client, entity, chat_id, w, image_format))
     # Ensure avatar directory exists
     avatar_dir = "./avatar/"
     os.makedirs(avatar_dir, exist_ok=True)
@@ -159,28 +224,81 @@ async def get_chat_avatar(chat_id: int, tg_client = Depends(get_telegram_client)
         headers["ETag"] = etag
     return FileResponse(tmp_path, media_type="image/jpeg", headers=headers)
 
-@router.get("/chats/{chat_id}/persona_mirror", response_model=UserProfileInsights)
+@router.get("/chats/{chat_id}/persona_mirror", response_model=PersonaMirrorResult)
 async def get_persona_mirror(
     chat_id: int,
     analyze_person: str = "self",
+    force_rebuild: bool = Query(False, description="Пересобрать профиль с нуля вместо инкрементального обновления"),
+    encoder: Optional[str] = Query(None, description="Формат переписки в промпте: compact или plain"),
     tg_client = Depends(get_telegram_client)
 ):
     """
     Получить краткий AI-портрет собеседника (Persona Mirror) по последним сообщениям чата.
+    Сохранённый профиль обновляется только по новым сообщениям.
     :param chat_id: ID чата
     :param analyze_person: 'self' или имя/username собеседника
-    :return: Словарь с результатами анализа (UserProfileInsights)
+    :param force_rebuild: пересобрать профиль целиком
+    :return: Профиль (UserProfileInsights) с prompt_tokens и tokens_saved по промптам этого обновления
     """
-    result = await TelegramService.analyze_persona_mirror(tg_client, chat_id, analyze_person)
+    _check_prompt_encoder(encoder)
+    PrecomputeScheduler.record_access(chat_id, PERSONA_TARGET_PREFIX + analyze_person)
+    result = await TelegramService.analyze_persona_mirror(tg_client, chat_id, analyze_person, force_rebuild=force_rebuild, encoder=encoder)
     return result
 
 @router.get("/chats/{chat_id}/summary", response_model=ChatSummary)
 async def get_chat_summary(
     chat_id: int,
     max_tokens: int = Query(4000, ge=500, le=16000, description="Максимум токенов для анализа"),
+    encoder: Optional[str] = Query(None, description="Формат переписки в промпте: compact или plain"),
+    mode: SummaryMode = Query(SummaryMode.FAST, description="fast — локальный summary сразу и LLM в фоне, llm — дождаться LLM, extractive — только локально"),
     tg_client = Depends(get_telegram_client)
 ):
     """
     Получить TL;DR (summary), key points, важные сообщения и последние непрочитанные сообщения по чату.
+    По умолчанию отвечает мгновенно: готовой LLM-версией или локальным summary. Если llm_pending=true,
+    LLM-версия считается в фоне и её вернёт повторный запрос с теми же max_tokens и encoder.
+    """
+    _check_prompt_encoder(encoder)
+    PrecomputeScheduler.record_access(chat_id, SUMMARY_TARGET)
+    return await TelegramService.summarize_chat(tg_client, chat_id, max_tokens, encoder, mode)
+
+@router.get("/chats/{chat_id}/analytics", response_model=ChatAnalytics)
+async def get_chat_analytics(
+    chat_id: int,
+    history_limit: int = Query(2000, ge=100, le=20000, description="Сколько последних сообщений учитывать"),
+    tz_offset_minutes: int = Query(0, ge=-720, le=840, description="Смещение часового пояса для тепловой карты и профиля часов"),
+    if_none_match: Optional[str] = Header(None),
+    response: Response = None,
+    tg_client = Depends(get_telegram_client)
+):
+    """
+    Аналитика чата: тепловая карта активности, объём по отправителям, медианное время ответа,
+    профиль активных часов и тренды. Агрегаты обновляются инкрементально по новым сообщениям.
+    """
+    # Тренды отсчитываются от текущего дня, поэтому с его сменой ответ меняется и без новых сообщений
+    today = ChatAnalyticsService.local_day(tz_offset_minutes)
+    etag = VersionRegistry.chat_etag(chat_id, "analytics", history_limit, tz_offset_minutes, today)
+    not_modified = _not_modified(etag, if_none_match, response)
+    if not_modified:
+        return not_modified
+    return await ChatAnalyticsService.get_chat_analytics(tg_client, chat_id, history_limit, tz_offset_minutes)
+
+@router.get("/digest", response_model=NewsDigest)
+async def get_news_digest(
+    hours: int = Query(24, ge=1, le=168, description="За сколько последних часов собирать посты"),
+    chat_ids: Optional[List[int]] = Query(None, description="ID каналов (по умолчанию все каналы)"),
+    max_items: int = Query(30, ge=1, le=100, description="Максимум новостей в дайджесте"),
+    tg_client = Depends(get_telegram_client)
+):
+    """
+    Дайджест каналов: репосты одной новости из разных каналов склеиваются,
+    и каждая новость отправляется в LLM один раз со ссылками на все источники.
+    """
+    return await DigestService.build_digest(tg_client, chat_ids, hours, max_items)
+
+@router.get("/precompute/status", response_model=PrecomputeStatus)
+async def get_precompute_status():
+    """
+    Состояние фонового предрасчёта: горячие чаты, простой, расход бюджета токенов.
     """
-    return await TelegramService.summarize_chat(tg_client, chat_id, max_tokens)
\ No newline at end of file
+    return PrecomputeScheduler.status()
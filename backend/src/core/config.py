@@ -10,6 +10,33 @@ API_ID = os.getenv("TELEGRAM_API_ID")
 API_HASH = os.getenv("TELEGRAM_API_HASH")
 PHONE_NUMBER = os.getenv("TELEGRAM_PHONE_NUMBER")
 SESSION_NAME = "telegram_session"
+# Локальная SQLite-база для данных, которые должны переживать перезапуск
+DB_PATH = os.getenv("DWH_DB_PATH", "personal_dwh.sqlite3")
+# Каждые N инкрементальных обновлений Persona Mirror профиль пересобирается целиком
+PERSONA_FULL_REBUILD_EVERY = int(os.getenv("PERSONA_FULL_REBUILD_EVERY", "10"))
+# Новые сообщения с прошлого анализа отправляются в LLM пачками в пределах max_tokens;
+# если пачек нужно больше, профиль пересобирается целиком по последним сообщениям
+PERSONA_MAX_PATCH_ROUNDS = int(os.getenv("PERSONA_MAX_PATCH_ROUNDS", "5"))
+# Формат переписки в промптах LLM: "compact" или "plain" (исходный построчный)
+PROMPT_ENCODER = os.getenv("PROMPT_ENCODER", "compact")
+# Notes extractor: порог локального скоринга, размер пачки для LLM и ожидание её заполнения (сек)
+NOTES_SCORE_THRESHOLD = int(os.getenv("NOTES_SCORE_THRESHOLD", "3"))
+NOTES_BATCH_SIZE = int(os.getenv("NOTES_BATCH_SIZE", "20"))
+NOTES_BATCH_WAIT = float(os.getenv("NOTES_BATCH_WAIT", "30"))
+# Отправлять напоминания в «Избранное» (Saved Messages)
+NOTES_REMINDERS_ENABLED = os.getenv("NOTES_REMINDERS_ENABLED", "1") == "1"
+# Предрасчёт summary и Persona Mirror для «горячих» чатов в простое
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "1") == "1"
+PRECOMPUTE_TOKEN_BUDGET_PER_HOUR = int(os.getenv("PRECOMPUTE_TOKEN_BUDGET_PER_HOUR", "60000"))
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+# Сколько секунд без запросов пользователя считается простоем
+PRECOMPUTE_IDLE_SECONDS = float(os.getenv("PRECOMPUTE_IDLE_SECONDS", "20"))
+# Persona Mirror обновляется, когда в чате набралось столько новых сообщений
+PRECOMPUTE_PERSONA_MIN_NEW_MESSAGES = int(os.getenv("PRECOMPUTE_PERSONA_MIN_NEW_MESSAGES", "30"))
+# Процессы для ресайза и перекодирования картинок (?w= / ?format=)
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+# Прогрев после старта: импорт AI-библиотек, словарь токенизатора, get_me и диалоги
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
 
 
 async def main():
@@ -0,0 +1,94 @@
+"""
+Модуль локального хранилища (SQLite).
+Одно соединение на процесс, схема создаётся при первом обращении.
+"""
+import sqlite3
+import threading
+from typing import Optional
+
+from .config import DB_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS persona_profiles (
+    chat_id INTEGER NOT NULL,
+    person TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    last_message_id INTEGER NOT NULL,
+    updates_since_rebuild INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, person)
+);
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    sender_name TEXT NOT NULL,
+    text TEXT NOT NULL,
+    title TEXT NOT NULL,
+    category TEXT NOT NULL,
+    message_date INTEGER NOT NULL,
+    remind_at INTEGER,
+    reminded INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL,
+    UNIQUE (chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS notes_remind_at ON notes (remind_at) WHERE done = 0 AND reminded = 0;
+CREATE TABLE IF NOT EXISTS notes_checked (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE TABLE IF NOT EXISTS chat_access (
+    chat_id INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    score REAL NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, target)
+);
+CREATE TABLE IF NOT EXISTS imported_chats (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    newest_message_id INTEGER NOT NULL DEFAULT 0,
+    imported_at INTEGER NOT NULL,
+    live INTEGER,
+    reconciled_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS imported_messages (
+    chat_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    date INTEGER NOT NULL,
+    sender_id INTEGER,
+    sender_name TEXT NOT NULL,
+    text TEXT,
+    reply_to_msg_id INTEGER,
+    forwarded_from TEXT,
+    media_type TEXT,
+    media_path TEXT,
+    mime_type TEXT,
+    duration INTEGER,
+    edited_at INTEGER,
+    from_author INTEGER NOT NULL DEFAULT 0,
+    deleted_live INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, id)
+) WITHOUT ROWID;
+"""
+
+_connection: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def get_connection() -> sqlite3.Connection:
+    """Возвращает общее соединение с базой, создавая схему при первом вызове."""
+    global _connection
+    with _lock:
+        if _connection is None:
+            connection = sqlite3.connect(DB_PATH, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            _connection = connection
+    return _connection
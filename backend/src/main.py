@@ -4,9 +4,15 @@
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api import telegram
+from brotli_asgi import BrotliMiddleware
+from .api import telegram, notes, imports, health
 from .core.dependencies import client
 from .core.config import PHONE_NUMBER, SESSION_NAME, API_ID, API_HASH
+from .services.notes import NotesPipeline
+from .services.scheduler import PrecomputeScheduler
+from .services.versions import VersionRegistry
+from .services.images import ImageVariantService
+from .services.warmup import WarmupService
 
 app = FastAPI(title="Telegram Personal DWH API")
 
@@ -19,10 +25,36 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# brotli для клиентов с Accept-Encoding: br, иначе gzip; медиа уже сжаты и отдаются с поддержкой Range
+app.add_middleware(
+    BrotliMiddleware,
+    minimum_size=1000,
+    gzip_fallback=True,
+    excluded_handlers=[r"^/telegram/media/", r"^/telegram/chat_avatar/"],
+)
+
+# Служебные опросы (мониторинг, статус предрасчёта) не считаются работой пользователя
+BACKGROUND_PATHS = ("/health", "/telegram/precompute/status")
+
+@app.middleware("http")
+async def track_interactive_load(request, call_next):
+    # Планировщик предрасчёта работает только когда пользователь ничего не ждёт
+    if request.url.path.rstrip("/") in BACKGROUND_PATHS:
+        return await call_next(request)
+    PrecomputeScheduler.request_started()
+    try:
+        return await call_next(request)
+    finally:
+        PrecomputeScheduler.request_finished()
+
 app.include_router(telegram.router, prefix="/telegram", tags=["telegram"])
+app.include_router(notes.router, prefix="/notes", tags=["notes"])
+app.include_router(imports.router, prefix="/imports", tags=["imports"])
+app.include_router(health.router, prefix="/health", tags=["health"])
 
 @app.on_event("startup")
 async def startup_event():
+    authorized_client = None
     if all([API_ID, API_HASH, PHONE_NUMBER]):
         try:
             await client.connect()
@@ -30,13 +62,24 @@ async def startup_event():
                 print(f"User {PHONE_NUMBER} is not authorized. Please run a separate script to authorize the session '{SESSION_NAME}.session'.")
             else:
                 print(f"Successfully connected and authorized as {PHONE_NUMBER}.")
+                VersionRegistry.start(client)
+                await NotesPipeline.start(client)
+                await PrecomputeScheduler.start(client)
+                authorized_client = client
         except Exception as e:
             print(f"Error connecting to Telegram during startup: {e}")
     else:
         print("Telegram client not started due to missing API credentials.")
+    # Прогрев идёт в фоне и не задерживает готовность
+    WarmupService.start(authorized_client)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await WarmupService.stop()
+    await NotesPipeline.stop()
+    await PrecomputeScheduler.stop()
+    VersionRegistry.stop()
+    ImageVariantService.shutdown()
     if client.is_connected():
         await client.disconnect()
         print("Disconnected from Telegram.")
@@ -0,0 +1,25 @@
+"""
+Репозиторий статистики обращений к AI-функциям чатов.
+"""
+from typing import List, Tuple
+
+from ..core.database import get_connection
+
+
+class AccessStatsRepository:
+    """
+    Хранит затухающий счётчик обращений по паре (чат, цель): "summary" или "persona:<имя>".
+    """
+    @staticmethod
+    def all() -> List[Tuple[int, str, float, int]]:
+        rows = get_connection().execute("SELECT chat_id, target, score, updated_at FROM chat_access")
+        return [(row["chat_id"], row["target"], row["score"], row["updated_at"]) for row in rows]
+
+    @staticmethod
+    def save(chat_id: int, target: str, score: float, updated_at: int) -> None:
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO chat_access (chat_id, target, score, updated_at) VALUES (?, ?, ?, ?)",
+                (chat_id, target, score, updated_at),
+            )
@@ -0,0 +1,89 @@
+"""
+Репозиторий истории, импортированной из экспорта Telegram Desktop.
+"""
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from ..core.database import get_connection
+from ..schemas.imports import ImportedChat
+
+MESSAGE_COLUMNS = (
+    "chat_id", "id", "date", "sender_id", "sender_name", "text", "reply_to_msg_id", "forwarded_from",
+    "media_type", "media_path", "mime_type", "duration", "edited_at", "from_author",
+)
+
+
+class ImportRepository:
+    """
+    Хранит импортированные чаты и сообщения; медиа не копируются, хранится путь к файлу экспорта.
+    """
+    @staticmethod
+    def save_chat(chat_id: int, chat_type: str, name: str, source: str, message_count: int,
+                  newest_message_id: int) -> None:
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO imported_chats "
+                "(id, type, name, source, message_count, newest_message_id, imported_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, chat_type, name, source, message_count, newest_message_id, int(time.time())),
+            )
+
+    @staticmethod
+    def insert_messages(rows: Sequence[tuple]) -> None:
+        """Вставляет пачку сообщений одной транзакцией (повторный импорт перезаписывает строки)."""
+        connection = get_connection()
+        with connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO imported_messages ({', '.join(MESSAGE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in MESSAGE_COLUMNS)})",
+                rows,
+            )
+
+    @staticmethod
+    def chats() -> List[ImportedChat]:
+        rows = get_connection().execute("SELECT * FROM imported_chats ORDER BY newest_message_id DESC")
+        return [ImportedChat(**dict(row)) for row in rows]
+
+    @staticmethod
+    def get_chat(chat_id: int) -> Optional[ImportedChat]:
+        row = get_connection().execute("SELECT * FROM imported_chats WHERE id = ?", (chat_id,)).fetchone()
+        return ImportedChat(**dict(row)) if row else None
+
+    @staticmethod
+    def messages(chat_id: int, limit: int, offset_id: int = 0) -> list:
+        """Сообщения от новых к старым; offset_id, как в Telethon, — вернуть сообщения старше него."""
+        query = "SELECT * FROM imported_messages WHERE chat_id = ?"
+        params: list = [chat_id]
+        if offset_id:
+            query += " AND id < ?"
+            params.append(offset_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return get_connection().execute(query, params).fetchall()
+
+    @staticmethod
+    def message(chat_id: int, message_id: int):
+        return get_connection().execute(
+            "SELECT * FROM imported_messages WHERE chat_id = ? AND id = ?", (chat_id, message_id)
+        ).fetchone()
+
+    @staticmethod
+    def newest(chat_id: int, limit: int) -> List[Tuple[int, int]]:
+        """(id, date) последних limit сообщений чата."""
+        rows = get_connection().execute(
+            "SELECT id, date FROM imported_messages WHERE chat_id = ? ORDER BY id DESC LIMIT ?", (chat_id, limit)
+        )
+        return [(row["id"], row["date"]) for row in rows]
+
+    @staticmethod
+    def mark_reconciled(chat_id: int, live: bool, deleted_ids: Iterable[int] = ()) -> None:
+        connection = get_connection()
+        with connection:
+            connection.executemany(
+                "UPDATE imported_messages SET deleted_live = 1 WHERE chat_id = ? AND id = ?",
+                [(chat_id, message_id) for message_id in deleted_ids],
+            )
+            connection.execute(
+                "UPDATE imported_chats SET live = ?, reconciled_at = ? WHERE id = ?",
+                (int(live), int(time.time()), chat_id),
+            )
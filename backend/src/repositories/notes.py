@@ -0,0 +1,83 @@
+"""
+Репозиторий заметок Notes extractor.
+"""
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from ..core.database import get_connection
+from ..schemas.notes import Note
+
+
+class NotesRepository:
+    """
+    Хранит заметки и отметки о сообщениях, которые уже проверялись LLM.
+    """
+    @staticmethod
+    def add(chat_id: int, message_id: int, sender_name: str, text: str, title: str, category: str,
+            message_date: int, remind_at: Optional[int]) -> bool:
+        """Сохраняет заметку; False, если для этого сообщения заметка уже есть."""
+        connection = get_connection()
+        with connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO notes "
+                "(chat_id, message_id, sender_name, text, title, category, message_date, remind_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, message_id, sender_name, text, title, category, message_date, remind_at, int(time.time())),
+            )
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def list(chat_id: Optional[int] = None, include_done: bool = False, due_before: Optional[int] = None,
+             limit: int = 100) -> List[Note]:
+        query = "SELECT * FROM notes WHERE 1 = 1"
+        params: list = []
+        if chat_id is not None:
+            query += " AND chat_id = ?"
+            params.append(chat_id)
+        if not include_done:
+            query += " AND done = 0"
+        if due_before is not None:
+            query += " AND remind_at IS NOT NULL AND remind_at <= ?"
+            params.append(due_before)
+        query += " ORDER BY COALESCE(remind_at, message_date) DESC LIMIT ?"
+        params.append(limit)
+        return [Note(**dict(row)) for row in get_connection().execute(query, params)]
+
+    @staticmethod
+    def pending_reminders(now: int) -> List[Note]:
+        rows = get_connection().execute(
+            "SELECT * FROM notes WHERE done = 0 AND reminded = 0 AND remind_at IS NOT NULL AND remind_at <= ? "
+            "ORDER BY remind_at",
+            (now,),
+        )
+        return [Note(**dict(row)) for row in rows]
+
+    @staticmethod
+    def mark_reminded(note_id: int) -> None:
+        connection = get_connection()
+        with connection:
+            connection.execute("UPDATE notes SET reminded = 1 WHERE id = ?", (note_id,))
+
+    @staticmethod
+    def mark_done(note_id: int) -> bool:
+        connection = get_connection()
+        with connection:
+            cursor = connection.execute("UPDATE notes SET done = 1 WHERE id = ?", (note_id,))
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def checked(keys: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+        """Из переданных (chat_id, message_id) возвращает те, что уже проверялись LLM."""
+        connection = get_connection()
+        return {
+            key for key in keys
+            if connection.execute(
+                "SELECT 1 FROM notes_checked WHERE chat_id = ? AND message_id = ?", key
+            ).fetchone()
+        }
+
+    @staticmethod
+    def mark_checked(keys: Iterable[Tuple[int, int]]) -> None:
+        connection = get_connection()
+        with connection:
+            connection.executemany("INSERT OR IGNORE INTO notes_checked (chat_id, message_id) VALUES (?, ?)", list(keys))
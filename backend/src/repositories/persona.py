@@ -0,0 +1,55 @@
+"""
+Репозиторий сохранённых профилей Persona Mirror.
+"""
+import json
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from ..core.database import get_connection
+
+
+class StoredPersonaProfile(BaseModel):
+    """Профиль Persona Mirror вместе с состоянием инкрементального анализа."""
+    chat_id: int
+    person: str
+    profile: dict
+    last_message_id: int
+    updates_since_rebuild: int
+    updated_at: int
+
+
+class PersonaProfileRepository:
+    """
+    Хранит профили по паре (чат, человек) и id последнего проанализированного сообщения.
+    """
+    @staticmethod
+    def get(chat_id: int, person: str) -> Optional[StoredPersonaProfile]:
+        row = get_connection().execute(
+            "SELECT * FROM persona_profiles WHERE chat_id = ? AND person = ?", (chat_id, person)
+        ).fetchone()
+        if row is None:
+            return None
+        return StoredPersonaProfile(**{**dict(row), "profile": json.loads(row["profile"])})
+
+    @staticmethod
+    def save(chat_id: int, person: str, profile: dict, last_message_id: int, updates_since_rebuild: int) -> StoredPersonaProfile:
+        stored = StoredPersonaProfile(
+            chat_id=chat_id,
+            person=person,
+            profile=profile,
+            last_message_id=last_message_id,
+            updates_since_rebuild=updates_since_rebuild,
+            updated_at=int(time.time()),
+        )
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO persona_profiles "
+                "(chat_id, person, profile, last_message_id, updates_since_rebuild, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (chat_id, person, json.dumps(profile, ensure_ascii=False), last_message_id,
+                 updates_since_rebuild, stored.updated_at),
+            )
+        return stored
@@ -3,7 +3,7 @@
 """
 from telethon import TelegramClient
 from telethon.tl.types import Dialog, Message as TelethonMessage
-from typing import List
+from typing import List, Optional
 
 class TelegramRepository:
     """
@@ -17,9 +17,10 @@ class TelegramRepository:
         return await client.get_dialogs(limit=limit)
 
     @staticmethod
-    async def get_messages(client: TelegramClient, chat_id: int, limit: int, offset_id: int = 0) -> List[TelethonMessage]:
+    async def get_messages(client: TelegramClient, chat_id: int, limit: Optional[int], offset_id: int = 0, min_id: int = 0) -> List[TelethonMessage]:
         """
         Получает сообщения из чата (оптимизировано).
+        min_id позволяет забрать только сообщения новее уже известного.
         """
         entity = await client.get_input_entity(chat_id)
-        return await client.get_messages(entity, limit=limit, offset_id=offset_id)
+        return await client.get_messages(entity, limit=limit, offset_id=offset_id, min_id=min_id)
@@ -0,0 +1,32 @@
+"""
+Pydantic models for health and warm-up status.
+"""
+from pydantic import BaseModel
+from typing import Optional, List
+from enum import Enum
+
+class WarmupState(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    DISABLED = "disabled"
+
+class WarmupStep(BaseModel):
+    """Один шаг прогрева и его длительность."""
+    name: str
+    seconds: Optional[float] = None
+    ok: Optional[bool] = None  # None — шаг пропущен
+    error: Optional[str] = None
+
+class WarmupStatus(BaseModel):
+    state: WarmupState
+    started_at: Optional[int] = None
+    total_seconds: Optional[float] = None
+    steps: List[WarmupStep] = []
+
+class HealthStatus(BaseModel):
+    """Готовность принимать запросы не зависит от прогрева: он идёт в фоне."""
+    ready: bool
+    telegram_connected: bool
+    uptime_seconds: float
+    warmup: WarmupStatus
@@ -0,0 +1,38 @@
+"""
+Pydantic models for Telegram Desktop export import.
+"""
+from pydantic import BaseModel
+from typing import Optional, List
+from .telegram import ChatType
+
+class ImportedChat(BaseModel):
+    """Чат, загруженный из экспорта Telegram Desktop."""
+    id: int  # id в формате Telethon (-100… для каналов и супергрупп)
+    type: ChatType
+    name: str
+    source: str
+    message_count: int
+    newest_message_id: int
+    imported_at: int
+    live: Optional[bool] = None  # найден ли чат в Telegram при последней сверке
+    reconciled_at: Optional[int] = None
+
+class ImportResult(BaseModel):
+    """Итог импорта одного result.json."""
+    chat_ids: List[int]
+    messages: int
+    service_messages_skipped: int
+    media_linked: int
+    media_missing: int
+    seconds: float
+
+class ImportReconcileResult(BaseModel):
+    """Сверка импортированных сообщений с живыми данными Telegram."""
+    chat_id: int
+    live: bool
+    checked: int = 0
+    matched: int = 0
+    deleted_live: int = 0
+    mismatched: int = 0
+    imported_newest_id: int = 0
+    live_newest_id: Optional[int] = None
@@ -0,0 +1,55 @@
+"""
+Pydantic models for Notes extractor.
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from enum import Enum
+
+class NoteCategory(str, Enum):
+    TASK = "task"
+    DEADLINE = "deadline"
+    MEETING = "meeting"
+    LINK = "link"
+    INFO = "info"
+
+class Note(BaseModel):
+    """Сохранённая заметка, извлечённая из сообщения."""
+    id: int
+    chat_id: int
+    message_id: int
+    sender_name: str
+    text: str
+    title: str
+    category: NoteCategory
+    message_date: int
+    remind_at: Optional[int] = None
+    reminded: bool = False
+    done: bool = False
+    created_at: int
+
+class NotesPipelineStats(BaseModel):
+    """Счётчики конвейера: сколько сообщений прошло локальный фильтр и сколько раз вызывалась LLM."""
+    received: int = 0
+    candidates: int = 0
+    llm_calls: int = 0
+    notes_saved: int = 0
+    queued: int = 0
+    dropped: int = Field(0, description="Кандидаты, отброшенные после исчерпания попыток классификации")
+    llm_call_rate: float = Field(0.0, description="Вызовы LLM на одно полученное сообщение")
+
+class NotesBackfillResult(BaseModel):
+    scanned: int
+    candidates: int
+
+# --- LLM extraction schemas ---
+class ExtractedNote(BaseModel):
+    """Решение по одному сообщению-кандидату."""
+    index: int = Field(..., description="Номер сообщения из списка <messages>")
+    is_note: bool = Field(..., description="Стоит ли сохранить сообщение как заметку (задача, дедлайн, встреча, полезная ссылка или важная информация)")
+    title: str = Field("", description="Короткий заголовок заметки на русском (до 80 символов)")
+    category: NoteCategory = Field(NoteCategory.INFO, description="Категория заметки")
+    remind_at: Optional[str] = Field(None, description="Когда напомнить, ISO 8601 с часовым поясом (например 2025-05-20T09:00:00+00:00), если в сообщении есть срок или время; иначе null")
+
+class NotesExtraction(BaseModel):
+    """Результат классификации пачки сообщений-кандидатов."""
+    notes: List[ExtractedNote] = Field(..., description="Решение для каждого сообщения из списка")
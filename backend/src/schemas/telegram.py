@@ -2,7 +2,7 @@
 Pydantic models for Telegram API.
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 
 class ChatType(str, Enum):
@@ -44,6 +44,10 @@ class ChatStats(BaseModel):
     group_unread: int = 0
     channel_unread: int = 0
 
+class ImageFormat(str, Enum):
+    WEBP = "webp"
+    JPEG = "jpeg"
+
 class AuthRequestCode(BaseModel):
     phone_number: str
 
@@ -166,10 +170,117 @@ class UserProfileInsights(BaseModel):
     class Config:
         populate_by_name = True
 
+class PersonaMirrorResult(UserProfileInsights):
+    """Ответ Persona Mirror: профиль и расход токенов на его обновление (None, если LLM не вызывалась)."""
+    prompt_tokens: Optional[int] = None  # токены переписки во всех пачках, отправленных в LLM
+    tokens_saved: Optional[int] = None  # экономия относительно исходного построчного формата
+
+class SummaryMode(str, Enum):
+    FAST = "fast"  # локальный экстрактивный summary сразу, LLM-версия подменяет его, когда готова
+    LLM = "llm"  # дождаться ответа LLM
+    EXTRACTIVE = "extractive"  # только локальный summary
+
 class ChatSummary(BaseModel):
     """Сводка по чату: summary, key points, важные сообщения, последние непрочитанные."""
     summary: str
     key_points: List[str]
     important_messages: List[Message]
     unread_messages: List[Message]
-    total_analyzed: int
\ No newline at end of file
+    total_analyzed: int
+    prompt_tokens: Optional[int] = None  # токены переписки, отправленные в LLM
+    tokens_saved: Optional[int] = None  # экономия относительно исходного построчного формата
+    source: str = "llm"  # "llm" или "extractive"
+    llm_pending: bool = False  # LLM-версия считается в фоне, повторный запрос вернёт её
+
+# --- Chat Analytics Schemas ---
+class SenderActivity(BaseModel):
+    """Активность одного отправителя в чате."""
+    sender_id: int
+    name: str
+    message_count: int
+    share: float = Field(..., description="Доля сообщений отправителя от общего числа (0..1)")
+    total_chars: int
+    avg_length: float
+    media_count: int
+    reply_count: int = Field(..., description="Сколько сообщений отправителя являются ответом (reply)")
+    median_response_seconds: Optional[float] = Field(None, description="Медианное время ответа на сообщение другого участника")
+    active_hours: List[float] = Field(..., description="Профиль активности по часам (24 значения, доли от 0 до 1)")
+
+class DailyActivity(BaseModel):
+    """Количество сообщений за день."""
+    date: str
+    count: int
+
+class ActivityTrend(BaseModel):
+    """Динамика активности в чате."""
+    daily: List[DailyActivity] = Field(..., description="Сообщения по дням за последние 30 дней истории")
+    last_7_days: int
+    previous_7_days: int
+    weekly_slope: float = Field(..., description="Наклон линейного тренда по неделям (сообщений/неделю за неделю)")
+
+class ChatAnalytics(BaseModel):
+    """Агрегированная аналитика по истории сообщений чата."""
+    chat_id: int
+    total_messages: int
+    first_message_date: Optional[int] = None
+    last_message_date: Optional[int] = None
+    heatmap: List[List[int]] = Field(..., description="Тепловая карта 7x24: день недели (пн=0) x час")
+    hourly_profile: List[int] = Field(..., description="Сообщения по часам суток (24 значения)")
+    media_breakdown: Dict[str, int]
+    median_response_seconds: Optional[float] = None
+    senders: List[SenderActivity]
+    trend: ActivityTrend
+
+
+# --- News Digest Schemas ---
+class DigestSource(BaseModel):
+    """Один пост-источник новости."""
+    chat_id: int
+    chat_name: str
+    message_id: int
+    date: int
+    link: Optional[str] = None
+
+class DigestItem(BaseModel):
+    """Новость дайджеста: кластер почти-одинаковых постов из разных каналов."""
+    title: str
+    summary: str
+    sources: List[DigestSource]
+
+class NewsDigest(BaseModel):
+    """Дайджест каналов за период."""
+    items: List[DigestItem]
+    total_posts: int
+    unique_clusters: int
+    duplication_ratio: float = Field(..., description="Во сколько раз постов больше, чем уникальных новостей")
+
+class DigestSummaryItem(BaseModel):
+    """Заголовок и краткое содержание одного кластера."""
+    index: int = Field(..., description="Номер новости из списка <news>")
+    title: str = Field(..., description="Короткий заголовок новости на русском")
+    summary: str = Field(..., description="Краткое содержание новости на русском (1-3 предложения)")
+
+class DigestExtraction(BaseModel):
+    """Краткие содержания новостей дайджеста."""
+    items: List[DigestSummaryItem] = Field(..., description="По одному элементу на каждую новость из списка")
+
+
+# --- Precompute Scheduler Schemas ---
+class HotChat(BaseModel):
+    """Чат, для которого планировщик предрасчитывает AI-результаты."""
+    chat_id: int
+    target: str = Field(..., description="'summary' или 'persona:<имя>'")
+    score: float
+    new_messages: int
+
+class PrecomputeStatus(BaseModel):
+    """Состояние планировщика предрасчёта."""
+    enabled: bool
+    idle: bool
+    in_flight_requests: int
+    backoff_seconds: float
+    running_jobs: int
+    tokens_used_last_hour: int
+    token_budget_per_hour: int
+    completed_jobs: int
+    hot_chats: List[HotChat]
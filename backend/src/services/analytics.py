@@ -0,0 +1,346 @@
+"""
+Сервис аналитики чатов.
+Хранит историю сообщений чата в колоночном виде (NumPy) и векторизованно считает
+тепловую карту активности, объём по отправителям, время ответа, профиль часов и тренды.
+"""
+import datetime
+import time
+from typing import Dict, Optional, Tuple
+
+from ..repositories.telegram import TelegramRepository
+from ..schemas.telegram import ChatAnalytics, SenderActivity, ActivityTrend, DailyActivity
+
+MEDIA_TYPES = ["text", "sticker", "photo", "voice", "document"]
+DEFAULT_HISTORY_LIMIT = 2000
+# Паузу длиннее 12 часов считаем началом нового разговора, а не ответом
+RESPONSE_GAP_LIMIT = 12 * 3600
+TREND_DAYS = 30
+TREND_WEEKS = 12
+
+
+def _media_code(msg) -> int:
+    """Код типа медиа в порядке MEDIA_TYPES (приоритет как в _convert_telethon_message)."""
+    if getattr(msg, 'sticker', None):
+        return 1
+    if getattr(msg, 'photo', None):
+        return 2
+    if getattr(msg, 'voice', None):
+        return 3
+    if getattr(msg, 'document', None):
+        return 4
+    return 0
+
+
+class ChatColumns:
+    """
+    Колоночное представление сообщений одного чата, отсортированное по id.
+    Каждый столбец — отдельный NumPy-массив одинаковой длины.
+    """
+    def __init__(self):
+        import numpy as np
+        self.ids = np.empty(0, dtype=np.int64)
+        self.dates = np.empty(0, dtype=np.int64)
+        self.sender_ids = np.empty(0, dtype=np.int64)
+        self.lengths = np.empty(0, dtype=np.int32)
+        self.media = np.empty(0, dtype=np.int8)
+        self.reply_to = np.empty(0, dtype=np.int64)
+        self.sender_names: Dict[int, str] = {}
+        self.exhausted = False  # True, если загружена вся история чата
+        self.version = 0  # растёт при каждом изменении, по нему инвалидируются агрегаты
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    @property
+    def min_id(self) -> int:
+        return int(self.ids[0]) if self.ids.size else 0
+
+    @property
+    def max_id(self) -> int:
+        return int(self.ids[-1]) if self.ids.size else 0
+
+    def append(self, messages) -> int:
+        """Добавляет сообщения Telethon, пропуская уже известные id. Возвращает число добавленных."""
+        import numpy as np
+        from .telegram import TelegramService
+
+        rows = []
+        for m in messages:
+            if not m:
+                continue
+            sender_id = getattr(m, 'sender_id', None) or 0
+            sender = getattr(m, 'sender', None)
+            if sender is not None and sender_id not in self.sender_names:
+                self.sender_names[sender_id] = TelegramService._get_sender_name(sender)
+            text = getattr(m, 'message', None) or ''
+            rows.append((
+                m.id,
+                int(m.date.timestamp()),
+                sender_id,
+                len(text),
+                _media_code(m),
+                getattr(m, 'reply_to_msg_id', None) or 0,
+            ))
+        if not rows:
+            return 0
+        ids, dates, sender_ids, lengths, media, reply_to = (np.array(col) for col in zip(*rows))
+        fresh = ~np.isin(ids, self.ids)
+        if not fresh.any():
+            return 0
+        ids = np.concatenate([self.ids, ids[fresh].astype(np.int64)])
+        order = np.argsort(ids, kind="stable")
+        self.ids = ids[order]
+        self.dates = np.concatenate([self.dates, dates[fresh].astype(np.int64)])[order]
+        self.sender_ids = np.concatenate([self.sender_ids, sender_ids[fresh].astype(np.int64)])[order]
+        self.lengths = np.concatenate([self.lengths, lengths[fresh].astype(np.int32)])[order]
+        self.media = np.concatenate([self.media, media[fresh].astype(np.int8)])[order]
+        self.reply_to = np.concatenate([self.reply_to, reply_to[fresh].astype(np.int64)])[order]
+        self.version += 1
+        return int(fresh.sum())
+
+
+class ChatAnalyticsService:
+    """Векторизованная аналитика по истории сообщений чатов."""
+    _columns: Dict[int, ChatColumns] = {}
+    # (chat_id, tz, history_limit, текущий день) -> (версия колонок, агрегаты)
+    _aggregates: Dict[tuple, Tuple[int, ChatAnalytics]] = {}
+
+    @staticmethod
+    async def get_chat_analytics(client, chat_id: int, history_limit: int = DEFAULT_HISTORY_LIMIT, tz_offset_minutes: int = 0) -> ChatAnalytics:
+        """Догружает новые сообщения чата и возвращает актуальные агрегаты."""
+        await ChatAnalyticsService.refresh(client, chat_id, history_limit)
+        return ChatAnalyticsService.compute(chat_id, tz_offset_minutes, history_limit)
+
+    @staticmethod
+    async def refresh(client, chat_id: int, history_limit: int = DEFAULT_HISTORY_LIMIT) -> ChatColumns:
+        """
+        Инкрементально обновляет колонки чата: сначала сообщения новее известных (min_id),
+        затем, если окно истории ещё не заполнено, более старые (offset_id).
+        """
+        columns = ChatAnalyticsService._columns.setdefault(chat_id, ChatColumns())
+        if len(columns):
+            columns = await ChatAnalyticsService._refresh_newer(client, chat_id, columns, history_limit)
+        missing = history_limit - len(columns)
+        if missing > 0 and not columns.exhausted:
+            older = await TelegramRepository.get_messages(client, chat_id, limit=missing, offset_id=columns.min_id)
+            columns.append(older)
+            if len(older) < missing:
+                columns.exhausted = True
+        return columns
+
+    @staticmethod
+    async def _refresh_newer(client, chat_id: int, columns: ChatColumns, history_limit: int) -> ChatColumns:
+        newer = await TelegramRepository.get_messages(client, chat_id, limit=history_limit, min_id=columns.max_id)
+        if len(newer) >= history_limit:
+            # Новых сообщений больше окна истории — начинаем заново, чтобы не оставлять дыр
+            columns = ChatColumns()
+            ChatAnalyticsService._columns[chat_id] = columns
+        columns.append(newer)
+        return columns
+
+    @staticmethod
+    async def for_prompt(client, chat_id: int, fetched) -> ChatAnalytics:
+        """
+        Аналитика для промптов без лишних запросов к Telegram: если история чата уже загружена,
+        догружаются только сообщения новее известных; иначе агрегаты считаются по сообщениям fetched,
+        которые вызывающий код уже получил.
+        """
+        columns = ChatAnalyticsService._columns.get(chat_id)
+        if columns is not None and len(columns):
+            await ChatAnalyticsService._refresh_newer(client, chat_id, columns, DEFAULT_HISTORY_LIMIT)
+            return ChatAnalyticsService.compute(chat_id, history_limit=DEFAULT_HISTORY_LIMIT)
+        window = ChatColumns()
+        window.append(fetched)
+        return ChatAnalyticsService._aggregate(chat_id, window, 0, None)
+
+    @staticmethod
+    def compute(chat_id: int, tz_offset_minutes: int = 0, history_limit: Optional[int] = None) -> ChatAnalytics:
+        """
+        Считает агрегаты по последним history_limit сообщениям из колонок чата (None — по всем загруженным).
+        Результат кэшируется до следующего изменения колонок или смены дня (от него считаются тренды).
+        """
+        columns = ChatAnalyticsService._columns.get(chat_id) or ChatColumns()
+        cache_key = (chat_id, tz_offset_minutes, history_limit, ChatAnalyticsService.local_day(tz_offset_minutes))
+        cached = ChatAnalyticsService._aggregates.get(cache_key)
+        if cached and cached[0] == columns.version and len(columns):
+            return cached[1]
+        result = ChatAnalyticsService._aggregate(chat_id, columns, tz_offset_minutes, history_limit)
+        ChatAnalyticsService._aggregates[cache_key] = (columns.version, result)
+        return result
+
+    @staticmethod
+    def _aggregate(chat_id: int, columns: ChatColumns, tz_offset_minutes: int, history_limit: Optional[int]) -> ChatAnalytics:
+        import numpy as np
+
+        # Колонки могли остаться от запроса с большим окном — берём только последние history_limit по id
+        window = slice(-history_limit, None) if history_limit and len(columns) > history_limit else slice(None)
+        exhausted = columns.exhausted and window.start is None
+        ids = columns.ids[window]
+        n = int(ids.size)
+        if n == 0:
+            return ChatAnalytics(
+                chat_id=chat_id,
+                total_messages=0,
+                heatmap=[[0] * 24 for _ in range(7)],
+                hourly_profile=[0] * 24,
+                media_breakdown={name: 0 for name in MEDIA_TYPES},
+                senders=[],
+                trend=ActivityTrend(daily=[], last_7_days=0, previous_7_days=0, weekly_slope=0.0),
+            )
+
+        # Сортировка по времени (id внутри чата почти монотонны, но не гарантированно)
+        order = np.argsort(columns.dates[window], kind="stable")
+        dates = columns.dates[window][order]
+        senders = columns.sender_ids[window][order]
+        lengths = columns.lengths[window][order]
+        media = columns.media[window][order]
+        reply_to = columns.reply_to[window][order]
+
+        local = dates + tz_offset_minutes * 60
+        days = local // 86400
+        hours = (local % 86400) // 3600
+        weekdays = (days + 3) % 7  # 1970-01-01 — четверг, понедельник = 0
+
+        heatmap = np.bincount(weekdays * 24 + hours, minlength=7 * 24).reshape(7, 24)
+        media_counts = np.bincount(media, minlength=len(MEDIA_TYPES))
+
+        unique_senders, inverse, counts = np.unique(senders, return_inverse=True, return_counts=True)
+        k = unique_senders.size
+        chars = np.bincount(inverse, weights=lengths, minlength=k)
+        media_per_sender = np.bincount(inverse, weights=(media > 0).astype(np.float64), minlength=k)
+        replies_per_sender = np.bincount(inverse, weights=(reply_to > 0).astype(np.float64), minlength=k)
+        hour_matrix = np.zeros((k, 24))
+        np.add.at(hour_matrix, (inverse, hours), 1)
+        hour_matrix /= hour_matrix.sum(axis=1, keepdims=True)
+
+        response = ChatAnalyticsService._response_times(ids, dates, senders, reply_to, order)
+        responded = response >= 0
+        sender_medians = ChatAnalyticsService._group_medians(inverse[responded], response[responded], k)
+        overall_median = float(np.median(response[responded])) if responded.any() else None
+
+        sender_stats = []
+        for j in np.argsort(-counts, kind="stable"):
+            sender_id = int(unique_senders[j])
+            sender_stats.append(SenderActivity(
+                sender_id=sender_id,
+                name=columns.sender_names.get(sender_id, str(sender_id)),
+                message_count=int(counts[j]),
+                share=round(float(counts[j]) / n, 4),
+                total_chars=int(chars[j]),
+                avg_length=round(float(chars[j]) / counts[j], 1),
+                media_count=int(media_per_sender[j]),
+                reply_count=int(replies_per_sender[j]),
+                median_response_seconds=None if np.isnan(sender_medians[j]) else float(sender_medians[j]),
+                active_hours=[round(float(v), 4) for v in hour_matrix[j]],
+            ))
+
+        return ChatAnalytics(
+            chat_id=chat_id,
+            total_messages=n,
+            first_message_date=int(dates[0]),
+            last_message_date=int(dates[-1]),
+            heatmap=heatmap.tolist(),
+            hourly_profile=heatmap.sum(axis=0).tolist(),
+            media_breakdown={name: int(c) for name, c in zip(MEDIA_TYPES, media_counts)},
+            median_response_seconds=overall_median,
+            senders=sender_stats,
+            trend=ChatAnalyticsService._trend(days, tz_offset_minutes, exhausted),
+        )
+
+    @staticmethod
+    def _response_times(ids, dates, senders, reply_to, order):
+        """
+        Время ответа для каждого сообщения (в порядке времени), -1 если это не ответ.
+        Явный reply на сообщение другого участника считается от даты исходного сообщения,
+        иначе — от предыдущего сообщения, если оно было от другого отправителя.
+        """
+        import numpy as np
+
+        n = dates.size
+        response = np.full(n, -1, dtype=np.int64)
+        if n > 1:
+            deltas = np.diff(dates)
+            turn = (senders[1:] != senders[:-1]) & (deltas <= RESPONSE_GAP_LIMIT)
+            response[1:][turn] = deltas[turn]
+
+        # ids отсортированы (ChatColumns), order переводит позицию по id в позицию по времени
+        position_by_time = np.empty(n, dtype=np.int64)
+        position_by_time[order] = np.arange(n)
+        pos = np.clip(np.searchsorted(ids, reply_to), 0, n - 1)
+        found = (reply_to > 0) & (ids[pos] == reply_to)
+        target = position_by_time[pos]
+        delta = dates - dates[target]
+        explicit = found & (senders[target] != senders) & (delta >= 0) & (delta <= RESPONSE_GAP_LIMIT)
+        response[explicit] = delta[explicit]
+        return response
+
+    @staticmethod
+    def _group_medians(groups, values, k: int):
+        """Медиана values внутри каждой из k групп без цикла по группам (NaN для пустых)."""
+        import numpy as np
+
+        medians = np.full(k, np.nan)
+        if not values.size:
+            return medians
+        order = np.lexsort((values, groups))
+        g = groups[order]
+        v = values[order].astype(np.float64)
+        starts = np.searchsorted(g, np.arange(k), side="left")
+        sizes = np.searchsorted(g, np.arange(k), side="right") - starts
+        present = sizes > 0
+        lo = starts[present] + (sizes[present] - 1) // 2
+        hi = starts[present] + sizes[present] // 2
+        medians[present] = (v[lo] + v[hi]) / 2
+        return medians
+
+    @staticmethod
+    def local_day(tz_offset_minutes: int) -> int:
+        """Номер текущего дня (от 1970-01-01) в часовом поясе клиента: от него считаются тренды."""
+        return int((time.time() + tz_offset_minutes * 60) // 86400)
+
+    @staticmethod
+    def _trend(days, tz_offset_minutes: int, exhausted: bool) -> ActivityTrend:
+        """Дневной ряд за последние 30 дней и недельный линейный тренд."""
+        import numpy as np
+
+        today = max(ChatAnalyticsService.local_day(tz_offset_minutes), int(days[-1]))
+        days_ago = today - days
+        recent = days_ago < TREND_DAYS
+        daily_counts = np.bincount(days_ago[recent], minlength=TREND_DAYS)[:TREND_DAYS][::-1]
+        epoch = datetime.date(1970, 1, 1)
+        daily = [
+            DailyActivity(date=(epoch + datetime.timedelta(days=today - TREND_DAYS + 1 + i)).isoformat(), count=int(c))
+            for i, c in enumerate(daily_counts)
+        ]
+
+        weeks_ago = days_ago // 7
+        # Самая старая неделя неполная, если история загружена не до конца — её не учитываем
+        covered = int(weeks_ago.max()) + (1 if exhausted else 0)
+        span = min(TREND_WEEKS, covered)
+        slope = 0.0
+        if span >= 2:
+            weekly = np.bincount(weeks_ago[weeks_ago < span], minlength=span)[::-1]
+            slope = float(np.polyfit(np.arange(span), weekly, 1)[0])
+        return ActivityTrend(
+            daily=daily,
+            last_7_days=int((days_ago < 7).sum()),
+            previous_7_days=int(((days_ago >= 7) & (days_ago < 14)).sum()),
+            weekly_slope=round(slope, 2),
+        )
+
+    @staticmethod
+    def describe_for_prompt(analytics: ChatAnalytics, top_senders: int = 5) -> str:
+        """Короткое текстовое описание активности для подстановки в промпт LLM."""
+        if not analytics.total_messages:
+            return ""
+        start = datetime.datetime.fromtimestamp(analytics.first_message_date, tz=datetime.timezone.utc).strftime("%Y.%m.%d")
+        end = datetime.datetime.fromtimestamp(analytics.last_message_date, tz=datetime.timezone.utc).strftime("%Y.%m.%d")
+        lines = [f"Сообщений: {analytics.total_messages} ({start} — {end}), за 7 дней: {analytics.trend.last_7_days}, за предыдущие 7: {analytics.trend.previous_7_days}"]
+        for s in analytics.senders[:top_senders]:
+            peak_hours = sorted(range(24), key=lambda h: s.active_hours[h], reverse=True)[:3]
+            response = f", медианное время ответа {int(s.median_response_seconds // 60)} мин" if s.median_response_seconds is not None else ""
+            lines.append(
+                f"- {s.name}: {s.message_count} сообщ. ({s.share:.0%}), средняя длина {s.avg_length:.0f} симв., "
+                f"медиа {s.media_count}, пик активности {', '.join(f'{h}:00' for h in sorted(peak_hours))} UTC{response}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,140 @@
+"""
+Поиск почти-дубликатов постов (MinHash + LSH).
+Репосты одной новости или вакансии в разных каналах собираются в кластеры,
+чтобы в LLM уходил один представитель кластера, а не каждая копия.
+"""
+import re
+import zlib
+from typing import Dict, Generic, List, Optional, TypeVar
+from urllib.parse import urlsplit
+
+from .prompt_encoder import URL_RE
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 полос по 4 строки: порог срабатывания ~0.5 по Жаккару
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_WINDOW = 72 * 3600
+# Короткие реплики ("да", "ок") не дедуплицируем — они почти всегда совпадают
+MIN_DEDUP_CHARS = 80
+
+WORD_RE = re.compile(r"\w+")
+
+T = TypeVar("T")
+
+
+def _permutations():
+    import numpy as np
+    rng = np.random.default_rng(20240521)
+    a = rng.integers(1, 1 << 31, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    return a, b
+
+
+_PERMUTATIONS = None
+
+
+def minhash_signature(text: str):
+    """MinHash-подпись текста по словесным 3-граммам; None, если в тексте нет слов."""
+    import numpy as np
+    global _PERMUTATIONS
+    if _PERMUTATIONS is None:
+        _PERMUTATIONS = _permutations()
+    a, b = _PERMUTATIONS
+
+    # Ссылки в репостах часто отличаются utm-метками, поэтому в подписи учитываем только домен
+    text = URL_RE.sub(lambda m: urlsplit(m.group(0)).netloc, text.lower())
+    words = WORD_RE.findall(text)
+    if not words:
+        return None
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * h + b) mod p для всех шинглов и перестановок сразу; a < 2^31, h < 2^32 — без переполнения
+    return ((hashes[:, None] * a[None, :] + b[None, :]) % MERSENNE_PRIME).min(axis=0)
+
+
+class NearDuplicateIndex(Generic[T]):
+    """
+    Индекс почти-дубликатов: LSH по полосам MinHash-подписи даёт кандидатов,
+    кандидаты проверяются оценкой сходства и объединяются (union-find),
+    если опубликованы в пределах временного окна.
+    """
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, window_seconds: int = DEFAULT_WINDOW):
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self._items: List[T] = []
+        self._dates: List[int] = []
+        self._signatures: list = []
+        self._parent: List[int] = []
+        self._buckets: Dict[bytes, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: T, text: Optional[str], date: int) -> int:
+        """Добавляет элемент и возвращает его позицию в индексе."""
+        index = len(self._items)
+        self._items.append(item)
+        self._dates.append(date)
+        self._parent.append(index)
+        signature = minhash_signature(text) if text else None
+        self._signatures.append(signature)
+        if signature is None:
+            return index
+        rows = NUM_PERMUTATIONS // LSH_BANDS
+        for band in range(LSH_BANDS):
+            key = bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes()
+            bucket = self._buckets.setdefault(key, [])
+            for other in bucket:
+                if self._find(other) == self._find(index):
+                    continue
+                if abs(self._dates[other] - date) > self.window_seconds:
+                    continue
+                if float((self._signatures[other] == signature).mean()) >= self.threshold:
+                    self._union(other, index)
+            bucket.append(index)
+        return index
+
+    def is_duplicate(self, index: int) -> bool:
+        """True, если элемент попал в кластер, где есть более ранний элемент."""
+        return self._find(index) != index
+
+    def clusters(self) -> List[List[T]]:
+        """Кластеры в порядке появления первого элемента; элементы внутри — в порядке добавления."""
+        groups: Dict[int, List[T]] = {}
+        for index, item in enumerate(self._items):
+            groups.setdefault(self._find(index), []).append(item)
+        return list(groups.values())
+
+    def _find(self, index: int) -> int:
+        while self._parent[index] != index:
+            self._parent[index] = self._parent[self._parent[index]]
+            index = self._parent[index]
+        return index
+
+    def _union(self, a: int, b: int) -> None:
+        root_a, root_b = self._find(a), self._find(b)
+        # Корнем остаётся более ранний элемент
+        if root_a < root_b:
+            self._parent[root_b] = root_a
+        else:
+            self._parent[root_a] = root_b
+
+
+def deduplicate_messages(messages, min_chars: int = MIN_DEDUP_CHARS):
+    """Убирает из списка сообщений Telethon почти-дубликаты более ранних (короткие сообщения не трогает)."""
+    ordered = sorted(messages, key=lambda m: m.date)
+    index: NearDuplicateIndex = NearDuplicateIndex()
+    result = []
+    for m in ordered:
+        text = getattr(m, 'message', None) or ''
+        if len(text) < min_chars:
+            result.append(m)
+            continue
+        if not index.is_duplicate(index.add(m, text, int(m.date.timestamp()))):
+            result.append(m)
+    return result
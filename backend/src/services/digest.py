@@ -0,0 +1,125 @@
+"""
+Сервис дайджеста каналов.
+Посты за период собираются из каналов, репосты склеиваются в кластеры почти-дубликатов,
+и каждый кластер отправляется в LLM один раз вместе со ссылками на все источники.
+"""
+import asyncio
+import time
+from typing import List, Optional
+
+from ..repositories.telegram import TelegramRepository
+from ..schemas.telegram import NewsDigest, DigestItem, DigestSource
+from .dedup import NearDuplicateIndex
+
+# Посты канала читаются страницами, пока не дойдём до начала периода; каналы опрашиваются параллельно
+POSTS_PAGE_SIZE = 100
+CHANNEL_CONCURRENCY = 5
+MAX_POST_CHARS = 1500
+
+
+class DigestService:
+    """Дайджест каналов с дедупликацией репостов."""
+    @staticmethod
+    async def build_digest(client, chat_ids: Optional[List[int]] = None, hours: int = 24, max_items: int = 30) -> NewsDigest:
+        """
+        Строит дайджест каналов за последние hours часов.
+        :param chat_ids: ID каналов; по умолчанию все каналы из списка диалогов
+        :param max_items: Максимум новостей в дайджесте (самые тиражируемые — первыми)
+        """
+        channels = await DigestService._channels(client, chat_ids)
+        since = int(time.time()) - hours * 3600
+        semaphore = asyncio.Semaphore(CHANNEL_CONCURRENCY)
+
+        async def fetch(chat_id: int, entity):
+            posts = []
+            offset_id = 0
+            async with semaphore:
+                while True:
+                    page = await TelegramRepository.get_messages(client, chat_id, limit=POSTS_PAGE_SIZE,
+                                                                 offset_id=offset_id)
+                    fresh = [m for m in page if int(m.date.timestamp()) >= since]
+                    posts.extend((chat_id, entity, m) for m in fresh if m.message)
+                    if len(page) < POSTS_PAGE_SIZE or len(fresh) < len(page):
+                        return posts
+                    offset_id = page[-1].id
+
+        fetched = await asyncio.gather(*(fetch(chat_id, entity) for chat_id, entity in channels))
+        posts = sorted((p for channel_posts in fetched for p in channel_posts), key=lambda p: p[2].date)
+
+        index: NearDuplicateIndex = NearDuplicateIndex(window_seconds=max(hours, 1) * 3600)
+        for post in posts:
+            index.add(post, post[2].message, int(post[2].date.timestamp()))
+        all_clusters = index.clusters()
+        clusters = sorted(all_clusters, key=len, reverse=True)[:max_items]
+        if not clusters:
+            return NewsDigest(items=[], total_posts=0, unique_clusters=0, duplication_ratio=1.0)
+
+        summaries = await DigestService._summarize_clusters(clusters)
+        items = []
+        for i, cluster in enumerate(clusters):
+            title, summary = summaries.get(i, ("", ""))
+            items.append(DigestItem(
+                title=title or DigestService._representative(cluster)[:80],
+                summary=summary,
+                sources=[DigestService._source(chat_id, entity, m) for chat_id, entity, m in cluster],
+            ))
+        unique = len(all_clusters)
+        return NewsDigest(
+            items=items,
+            total_posts=len(posts),
+            unique_clusters=unique,
+            duplication_ratio=round(len(posts) / unique, 2),
+        )
+
+    @staticmethod
+    async def _channels(client, chat_ids: Optional[List[int]]):
+        if chat_ids:
+            return [(chat_id, await client.get_entity(chat_id)) for chat_id in chat_ids]
+        dialogs = await TelegramRepository.get_dialogs(client, limit=500)
+        return [(d.id, d.entity) for d in dialogs if d.is_channel and not d.is_group]
+
+    @staticmethod
+    def _representative(cluster) -> str:
+        """Самый полный текст кластера — он и уходит в LLM."""
+        return max((m.message for _, _, m in cluster), key=len)
+
+    @staticmethod
+    def _source(chat_id: int, entity, msg) -> DigestSource:
+        username = getattr(entity, 'username', None)
+        if username:
+            link = f"https://t.me/{username}/{msg.id}"
+        else:
+            link = f"https://t.me/c/{entity.id}/{msg.id}"
+        return DigestSource(
+            chat_id=chat_id,
+            chat_name=getattr(entity, 'title', None) or str(chat_id),
+            message_id=msg.id,
+            date=int(msg.date.timestamp()),
+            link=link,
+        )
+
+    @staticmethod
+    async def _summarize_clusters(clusters) -> dict:
+        """Один вызов LLM: заголовок и краткое содержание для представителя каждого кластера."""
+        import os
+        from langchain_openai import ChatOpenAI
+        from trustcall import create_extractor
+        from ..schemas.telegram import DigestExtraction
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY не найден в переменных окружения.")
+        llm = ChatOpenAI(model="gpt-4.1-mini", api_key=api_key)
+        bound = create_extractor(llm, tools=[DigestExtraction], tool_choice="DigestExtraction")
+        lines = []
+        for i, cluster in enumerate(clusters):
+            text = " ".join(DigestService._representative(cluster).split())[:MAX_POST_CHARS]
+            lines.append(f"[{i}] (источников: {len(cluster)}) {text}")
+        news = "\n".join(lines)
+        prompt = (
+            f"""Для каждой новости из списка дай короткий заголовок и краткое содержание на русском.\n<news>\n{news}\n</news>"""
+        )
+        result = await bound.ainvoke(prompt)
+        if not result or not result.get("responses"):
+            raise RuntimeError("LLM не вернул валидный ответ для дайджеста.")
+        return {item.index: (item.title, item.summary) for item in result["responses"][0].items}
@@ -0,0 +1,185 @@
+"""
+Потоковое чтение экспорта Telegram Desktop (result.json).
+Файл читается кусками: по структуре верхнего уровня и массивам чатов/сообщений идём вручную,
+а каждое сообщение целиком разбирает json.JSONDecoder.raw_decode — в памяти только буфер и одно сообщение.
+Поддерживаются экспорт всего аккаунта (chats.list, left_chats.list) и экспорт одного чата.
+"""
+import json
+from typing import Any, Dict, Iterator, Optional, TextIO, Tuple
+
+CHUNK_SIZE = 1 << 20
+WHITESPACE = " \t\r\n"
+# Разделы полного экспорта со списками чатов
+CHAT_SECTIONS = ("chats", "left_chats")
+
+
+class JsonStream:
+    """Минимальный pull-парсер JSON поверх текстового файла с подкачкой буфера."""
+    def __init__(self, file: TextIO, chunk_size: int = CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Дочитывает следующий кусок, отбрасывая уже разобранное; False в конце файла."""
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Следующий значимый символ ('' в конце файла)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found or 'EOF'}' in export")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Разбирает очередное значение целиком."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Число на границе буфера может продолжаться в следующем куске
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def items(self) -> Iterator[str]:
+        """
+        Ключи объекта по одному; после каждого ключа вызывающий обязан прочитать значение
+        (value() или вложенным items()/elements()).
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def elements(self) -> Iterator[None]:
+        """Элементы массива по одному; на каждом шаге вызывающий читает элемент."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield None
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+class TelegramExportReader:
+    """
+    Обходит экспорт и отдаёт пары (заголовок чата, итератор сообщений).
+    Итератор сообщений нужно дочитать до перехода к следующему чату — иначе он будет пропущен.
+    """
+    def __init__(self, file: TextIO, chunk_size: int = CHUNK_SIZE):
+        self._stream = JsonStream(file, chunk_size)
+        self.account: Dict[str, Any] = {}
+
+    def chats(self) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+        stream = self._stream
+        header: Dict[str, Any] = {}
+        for key in stream.items():
+            if key in CHAT_SECTIONS and stream.peek() == "{":
+                for section_key in stream.items():
+                    if section_key == "list":
+                        for _ in stream.elements():
+                            yield from self._chat(key == "left_chats")
+                    else:
+                        stream.value()
+            elif key == "messages":
+                # Экспорт одного чата: сам верхний объект и есть чат
+                yield from self._with_messages(header)
+            else:
+                value = stream.value()
+                if key == "personal_information":
+                    self.account = value
+                else:
+                    header[key] = value
+
+    def _chat(self, left: bool) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+        stream = self._stream
+        header: Dict[str, Any] = {"left": left}
+        has_messages = False
+        for key in stream.items():
+            if key == "messages":
+                has_messages = True
+                yield from self._with_messages(header)
+            else:
+                header[key] = stream.value()
+        if not has_messages:
+            yield header, iter(())
+
+    def _with_messages(self, header: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+        if "id" not in header or "type" not in header:
+            raise ValueError("Chat 'id' and 'type' must precede 'messages' in the export")
+        messages = self._messages()
+        yield header, messages
+        for _ in messages:
+            pass
+
+    def _messages(self) -> Iterator[Dict[str, Any]]:
+        for _ in self._stream.elements():
+            yield self._stream.value()
+
+
+def open_export(path: str) -> Tuple[TextIO, TelegramExportReader]:
+    """Открывает result.json (utf-8, с BOM или без)."""
+    file = open(path, "r", encoding="utf-8-sig")
+    return file, TelegramExportReader(file)
+
+
+def peer_id(chat_type: str, raw_id: int) -> int:
+    """
+    Переводит id из экспорта в id, который использует Telethon:
+    каналы и супергруппы получают префикс -100, обычные группы — минус, личные чаты не меняются.
+    """
+    if chat_type in ("public_supergroup", "private_supergroup", "public_channel", "private_channel"):
+        return -1000000000000 - raw_id
+    if chat_type == "private_group":
+        return -raw_id
+    return raw_id
+
+
+def sender_peer_id(from_id: Optional[str]) -> Optional[int]:
+    """'user123' -> 123, 'channel123' -> -100123, 'chat123' -> -123."""
+    if not from_id:
+        return None
+    for prefix, convert in (("user", lambda x: x), ("channel", lambda x: -1000000000000 - x), ("chat", lambda x: -x)):
+        if from_id.startswith(prefix) and from_id[len(prefix):].isdigit():
+            return convert(int(from_id[len(prefix):]))
+    return None
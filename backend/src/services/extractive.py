@@ -0,0 +1,153 @@
+"""
+Локальный экстрактивный summarizer.
+Ранжирует предложения переписки TF-IDF + TextRank (NumPy) и собирает из лучших
+TL;DR, key points и важные сообщения — без обращения к LLM, за миллисекунды.
+"""
+import re
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+from .prompt_encoder import URL_RE, message_text
+
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+TOKEN_RE = re.compile(r"[^\W\d_]{3,}")
+STOPWORDS = {
+    "это", "что", "как", "так", "все", "всё", "его", "она", "они", "оно", "мне", "меня", "тебя", "тебе", "мы",
+    "вы", "там", "тут", "вот", "еще", "ещё", "уже", "или", "если", "когда", "чтобы", "только", "тоже", "также",
+    "был", "была", "были", "быть", "есть", "нет", "для", "при", "без", "под", "над", "про", "после", "через",
+    "может", "можно", "нужно", "надо", "очень", "просто", "даже", "где", "кто", "чем", "тем", "этот", "эта",
+    "эти", "того", "этого", "этом", "них", "нас", "вас", "ним", "ней", "ничего", "потом", "сейчас", "давай",
+    "the", "and", "for", "that", "this", "with", "you", "are", "was", "have", "not", "but", "from", "they",
+    "will", "would", "there", "their", "what", "about", "which", "when", "your", "can", "just", "all",
+}
+MIN_SENTENCE_TOKENS = 3
+MAX_VOCABULARY = 3000
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+# Предложения с косинусным сходством выше порога считаются повтором уже выбранных
+REDUNDANCY_THRESHOLD = 0.6
+SUMMARY_SENTENCES = 3
+KEY_POINTS = 5
+IMPORTANT_MESSAGES = 5
+
+
+class ExtractiveSummary(BaseModel):
+    """Результат экстрактивного ранжирования."""
+    summary: str
+    key_points: List[str]
+    important_message_ids: List[int]
+    total_analyzed: int
+
+
+class ExtractiveSummarizer:
+    """TF-IDF + TextRank по предложениям окна сообщений."""
+    @staticmethod
+    def summarize(messages) -> ExtractiveSummary:
+        """
+        :param messages: Сообщения Telethon (порядок не важен)
+        :return: TL;DR из лучших предложений в хронологическом порядке, key points и id важных сообщений
+        """
+        import numpy as np
+
+        ordered = sorted((m for m in messages if message_text(m)), key=lambda m: m.date)
+        units = []  # (позиция сообщения, предложение, токены)
+        for position, m in enumerate(ordered):
+            text = URL_RE.sub("", getattr(m, 'message', None) or message_text(m))
+            for sentence in SENTENCE_RE.split(text):
+                sentence = sentence.strip()
+                tokens = [t for t in (w.lower() for w in TOKEN_RE.findall(sentence)) if t not in STOPWORDS]
+                if len(tokens) >= MIN_SENTENCE_TOKENS:
+                    units.append((position, sentence, tokens))
+        if not units:
+            return ExtractiveSummary(summary="", key_points=[], important_message_ids=[], total_analyzed=len(ordered))
+
+        vectors = ExtractiveSummarizer._tfidf([tokens for _, _, tokens in units])
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, 0.0)
+        scores = ExtractiveSummarizer._textrank(similarity)
+
+        # Сообщения, на которые отвечали, важнее
+        reply_counts: Dict[int, int] = {}
+        for m in ordered:
+            reply_to = getattr(m, 'reply_to_msg_id', None)
+            if reply_to:
+                reply_counts[reply_to] = reply_counts.get(reply_to, 0) + 1
+        boost = np.array([1.0 + 0.2 * reply_counts.get(ordered[position].id, 0) for position, _, _ in units])
+        scores = scores * boost
+
+        selected = ExtractiveSummarizer._select(scores, similarity, max(SUMMARY_SENTENCES, KEY_POINTS))
+        summary = " ".join(units[i][1] for i in sorted(selected[:SUMMARY_SENTENCES]))
+        key_points = [units[i][1] for i in selected[:KEY_POINTS]]
+
+        # Важные сообщения — те, из которых взяты лучшие неповторяющиеся предложения
+        positions = []
+        for i in ExtractiveSummarizer._select(scores, similarity, len(units)):
+            if units[i][0] not in positions:
+                positions.append(units[i][0])
+            if len(positions) >= IMPORTANT_MESSAGES:
+                break
+        important = [ordered[p].id for p in sorted(positions)]
+        return ExtractiveSummary(
+            summary=summary,
+            key_points=key_points,
+            important_message_ids=important,
+            total_analyzed=len(ordered),
+        )
+
+    @staticmethod
+    def _tfidf(documents: List[List[str]]):
+        """L2-нормированная TF-IDF матрица предложений (словарь ограничен самыми частыми терминами)."""
+        import numpy as np
+
+        df: Dict[str, int] = {}
+        for tokens in documents:
+            for term in set(tokens):
+                df[term] = df.get(term, 0) + 1
+        vocabulary = {term: i for i, term in enumerate(sorted(df, key=df.get, reverse=True)[:MAX_VOCABULARY])}
+        rows, cols = [], []
+        for row, tokens in enumerate(documents):
+            for term in tokens:
+                col = vocabulary.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        counts = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        np.add.at(counts, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), 1.0)
+        doc_freq = np.array([df[term] for term in vocabulary], dtype=np.float32)
+        idf = np.log((1 + len(documents)) / (1 + doc_freq)) + 1.0
+        tfidf = (counts / np.maximum(counts.sum(axis=1, keepdims=True), 1.0)) * idf
+        norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+        return tfidf / np.maximum(norms, 1e-9)
+
+    @staticmethod
+    def _textrank(similarity):
+        """PageRank по графу сходства предложений (степенной метод)."""
+        import numpy as np
+
+        n = similarity.shape[0]
+        out_weight = similarity.sum(axis=1, keepdims=True)
+        # У изолированных предложений переход равномерный, чтобы матрица оставалась стохастической
+        transition = np.where(out_weight > 0, similarity / np.maximum(out_weight, 1e-9), 1.0 / n)
+        scores = np.full(n, 1.0 / n)
+        for _ in range(MAX_ITERATIONS):
+            updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < 1e-6:
+                scores = updated
+                break
+            scores = updated
+        return scores
+
+    @staticmethod
+    def _select(scores, similarity, count: int) -> List[int]:
+        """Лучшие предложения по убыванию score без повторов (сходство с выбранными ниже порога)."""
+        import numpy as np
+
+        selected: List[int] = []
+        for i in np.argsort(-scores, kind="stable"):
+            if selected and similarity[i, selected].max() > REDUNDANCY_THRESHOLD:
+                continue
+            selected.append(int(i))
+            if len(selected) >= count:
+                break
+        return selected
@@ -0,0 +1,173 @@
+"""
+Варианты изображений (?w= / ?format=webp) для медиа сообщений и аватарок.
+Если у Telegram есть встроенная миниатюра не уже запрошенной ширины, скачивается она, а не оригинал.
+Ресайз и перекодирование идут в пуле процессов (Pillow), чтобы не блокировать event loop;
+скачанные файлы и готовые варианты кэшируются рядом друг с другом.
+"""
+import asyncio
+import glob
+import os
+import shutil
+import tempfile
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from ..core.config import IMAGE_VARIANT_WORKERS
+from ..schemas.telegram import ImageFormat
+
+MEDIA_CACHE_DIR = os.path.join(tempfile.gettempdir(), "telegram_media")
+# Маленькая аватарка в Telegram — 160×160, большая — 640×640
+SMALL_AVATAR_SIZE = 160
+QUALITY = {"webp": 80, "jpeg": 85}
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+FORMATS = {".webp": "webp", ".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png"}
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+# Скачивание идёт в base + PARTIAL_SUFFIX + расширение; в кэш файл попадает только целиком
+PARTIAL_SUFFIX = "-partial"
+
+
+def render_variant(source: str, target: str, width: Optional[int], image_format: str) -> None:
+    """Уменьшает картинку до ширины width (не увеличивая) и сохраняет в image_format. Выполняется в дочернем процессе."""
+    from PIL import Image, ImageOps
+
+    source_format = FORMATS.get(os.path.splitext(source)[1].lower())
+    partial = target + ".part"
+    with Image.open(source) as image:
+        if (not width or image.width <= width) and image_format == source_format:
+            shutil.copyfile(source, partial)
+        else:
+            image = ImageOps.exif_transpose(image)
+            if width and image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            if image_format == "jpeg" or not image.has_transparency_data:
+                image = image.convert("RGB")
+            elif image.mode != "RGBA":
+                image = image.convert("RGBA")
+            image.save(partial, format=image_format.upper(), quality=QUALITY.get(image_format, 85))
+    os.replace(partial, target)
+
+
+class ImageVariantService:
+    """Скачивание исходников с кэшем и выдача вариантов нужной ширины и формата."""
+    _pool = None
+    _pending: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def is_image(msg) -> bool:
+        """Фото или документ-картинка (в том числе статичный стикер); анимированные стикеры и видео не подходят."""
+        if msg.photo:
+            return True
+        mime_type = getattr(msg.document, 'mime_type', None) or ''
+        return mime_type.startswith("image/")
+
+    @staticmethod
+    async def media_variant(client, msg, width: Optional[int], image_format: Optional[ImageFormat]) -> Tuple[str, str]:
+        """
+        :return: Путь к варианту и его content type. Для фото самый большой размер и есть оригинал,
+                 для документов без подходящей миниатюры скачивается сам файл.
+        """
+        media = msg.photo or msg.document
+        sizes = msg.photo.sizes if msg.photo else msg.document.thumbs
+        thumb = ImageVariantService._pick_thumb(sizes, width)
+        base = os.path.join(MEDIA_CACHE_DIR, f"{msg.chat_id}_{msg.id}_{media.id}_{thumb or 'full'}")
+        source = await ImageVariantService._cached_download(
+            base, lambda path: client.download_media(msg, file=path, thumb=thumb)
+        )
+        return await ImageVariantService.variant(source, width, image_format)
+
+    @staticmethod
+    async def avatar_variant(client, entity, chat_id: int, width: Optional[int],
+                             image_format: Optional[ImageFormat]) -> Tuple[str, str]:
+        """Вариант аватарки: для ширины до 160 px хватает маленькой версии, которую Telegram хранит отдельно."""
+        big = not width or width > SMALL_AVATAR_SIZE
+        photo_id = getattr(entity.photo, 'photo_id', 0)
+        base = os.path.join(MEDIA_CACHE_DIR, f"avatar_{chat_id}_{photo_id}_{'big' if big else 'small'}")
+        source = await ImageVariantService._cached_download(
+            base, lambda path: client.download_profile_photo(entity, file=path, download_big=big)
+        )
+        return await ImageVariantService.variant(source, width, image_format)
+
+    @staticmethod
+    async def variant(source: str, width: Optional[int], image_format: Optional[ImageFormat]) -> Tuple[str, str]:
+        """Готовит (или берёт из кэша) вариант файла source; одинаковые параллельные запросы ждут один рендер."""
+        root, extension = os.path.splitext(source)
+        fmt = image_format.value if image_format else FORMATS.get(extension.lower(), "jpeg")
+        target = f"{root}-{f'w{width}' if width else 'full'}{EXTENSIONS[fmt]}"
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            return target, CONTENT_TYPES[fmt]
+
+        future = ImageVariantService._pending.get(target)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(ImageVariantService._executor(), render_variant, source, target, width, fmt)
+            ImageVariantService._pending[target] = future
+            future.add_done_callback(lambda _: ImageVariantService._pending.pop(target, None))
+        await asyncio.shield(future)
+        return target, CONTENT_TYPES[fmt]
+
+    @staticmethod
+    def shutdown() -> None:
+        if ImageVariantService._pool is not None:
+            ImageVariantService._pool.shutdown(wait=False, cancel_futures=True)
+            ImageVariantService._pool = None
+
+    @staticmethod
+    def _executor():
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        if ImageVariantService._pool is None:
+            # spawn: форк процесса с потоками Telethon и event loop небезопасен
+            ImageVariantService._pool = ProcessPoolExecutor(
+                max_workers=IMAGE_VARIANT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return ImageVariantService._pool
+
+    @staticmethod
+    def _pick_thumb(sizes, width: Optional[int]) -> Optional[str]:
+        """Тип самой маленькой миниатюры Telegram шириной не меньше width; None — нужен оригинал."""
+        if not width:
+            return None
+        candidates = [
+            size for size in sizes or []
+            if getattr(size, 'w', None) and getattr(size, 'type', None) and size.w >= width
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda size: size.w).type
+
+    @staticmethod
+    async def _cached_download(base: str, download: Callable[[str], Awaitable[Optional[str]]]) -> str:
+        """Скачивает файл в base (расширение подставит Telethon), если он ещё не в кэше."""
+        cached = [path for path in glob.glob(glob.escape(base) + ".*") if not path.endswith(".part")]
+        if cached:
+            return cached[0]
+        future = ImageVariantService._pending.get(base)
+        if future is None:
+            os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+            future = asyncio.ensure_future(ImageVariantService._download_complete(base, download))
+            ImageVariantService._pending[base] = future
+            future.add_done_callback(lambda _: ImageVariantService._pending.pop(base, None))
+        path = await asyncio.shield(future)
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(base)
+        return path
+
+    @staticmethod
+    async def _download_complete(base: str, download: Callable[[str], Awaitable[Optional[str]]]) -> Optional[str]:
+        """
+        Telethon пишет прямо в целевой файл и не удаляет его при обрыве загрузки, поэтому скачиваем
+        во временное имя и переименовываем в base.<расширение> только после успешного завершения.
+        """
+        partial = base + PARTIAL_SUFFIX
+        try:
+            path = await download(partial)
+        except BaseException:
+            # В том числе отмена: недокачанный файл не должен остаться рядом с кэшем
+            for leftover in glob.glob(glob.escape(partial) + "*"):
+                os.remove(leftover)
+            raise
+        if not path or not os.path.exists(path):
+            return None
+        target = base + os.path.splitext(path)[1]
+        os.replace(path, target)
+        return target
@@ -0,0 +1,225 @@
+"""
+Импорт истории из экспорта Telegram Desktop (result.json + папки с медиа).
+Экспорт читается потоково, сообщения приводятся к той же модели Message, что отдаёт API,
+и пачками вставляются в SQLite; медиафайлы не копируются — сохраняется путь к ним в папке экспорта.
+После импорта чаты можно сверить с живыми данными Telegram.
+
+Запуск: python -m src.services.importer /path/to/result.json [--self-id ID] [--reconcile]
+"""
+import datetime
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from ..repositories.imports import ImportRepository
+from ..repositories.telegram import TelegramRepository
+from ..schemas.imports import ImportResult, ImportReconcileResult
+from ..schemas.telegram import ChatType, Message, Sender
+from .export_reader import open_export, peer_id, sender_peer_id
+
+# Сообщений в одной транзакции
+IMPORT_BATCH_SIZE = 20000
+# Сколько последних импортированных сообщений сверять с Telegram
+RECONCILE_SAMPLE = 200
+CHAT_TYPES = {
+    "personal_chat": ChatType.PERSONAL,
+    "bot_chat": ChatType.PERSONAL,
+    "saved_messages": ChatType.PERSONAL,
+    "private_group": ChatType.GROUP,
+    "public_supergroup": ChatType.GROUP,
+    "private_supergroup": ChatType.GROUP,
+    "public_channel": ChatType.CHANNEL,
+    "private_channel": ChatType.CHANNEL,
+}
+# Типы медиа экспорта -> типы, которые использует TelegramService
+MEDIA_TYPES = {"sticker": "sticker", "voice_message": "voice"}
+
+
+class ImportService:
+    """Импорт экспорта Telegram Desktop и сверка с живыми данными."""
+    @staticmethod
+    def import_export(path: str, self_id: Optional[int] = None) -> ImportResult:
+        """
+        :param path: Путь к result.json (полный экспорт аккаунта или экспорт одного чата)
+        :param self_id: id своего аккаунта; в полном экспорте берётся из personal_information
+        """
+        started = time.monotonic()
+        source = os.path.abspath(path)
+        base_dir = os.path.dirname(source)
+        stats = {"messages": 0, "service": 0, "media_linked": 0, "media_missing": 0}
+        chat_ids: List[int] = []
+        batch: List[tuple] = []
+
+        file, reader = open_export(source)
+        with file:
+            for header, messages in reader.chats():
+                if self_id is None:
+                    self_id = reader.account.get("user_id")
+                chat_type = header["type"]
+                chat_id = peer_id(chat_type, int(header["id"]))
+                name = header.get("name") or ("Saved Messages" if chat_type == "saved_messages" else str(chat_id))
+                count = newest = 0
+                for record in messages:
+                    if record.get("type") != "message":
+                        stats["service"] += 1
+                        continue
+                    row = ImportService._message_row(record, chat_id, base_dir, self_id, stats)
+                    batch.append(row)
+                    count += 1
+                    newest = max(newest, row[1])
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        ImportRepository.insert_messages(batch)
+                        batch = []
+                if batch:
+                    ImportRepository.insert_messages(batch)
+                    batch = []
+                chat_kind = CHAT_TYPES.get(chat_type, ChatType.PERSONAL)
+                ImportRepository.save_chat(chat_id, chat_kind.value, name, source, count, newest)
+                chat_ids.append(chat_id)
+                stats["messages"] += count
+
+        return ImportResult(
+            chat_ids=chat_ids,
+            messages=stats["messages"],
+            service_messages_skipped=stats["service"],
+            media_linked=stats["media_linked"],
+            media_missing=stats["media_missing"],
+            seconds=round(time.monotonic() - started, 3),
+        )
+
+    @staticmethod
+    def _message_row(record: Dict[str, Any], chat_id: int, base_dir: str, self_id: Optional[int],
+                     stats: Dict[str, int]) -> tuple:
+        sender_id = sender_peer_id(record.get("from_id"))
+        media_type = media_path = None
+        if "photo" in record:
+            media_type, media_path = "photo", record["photo"]
+        elif "file" in record:
+            media_type = MEDIA_TYPES.get(record.get("media_type"), "document")
+            media_path = record["file"]
+        if media_path is not None:
+            # Файлы, не попавшие в экспорт, записаны как "(File not included. ...)"
+            absolute = os.path.join(base_dir, media_path)
+            if not media_path.startswith("(") and os.path.isfile(absolute):
+                media_path = absolute
+                stats["media_linked"] += 1
+            else:
+                media_path = None
+                stats["media_missing"] += 1
+        return (
+            chat_id,
+            int(record["id"]),
+            ImportService._timestamp(record, "date"),
+            sender_id,
+            record.get("from") or "Unknown",
+            ImportService._text(record.get("text")) or None,
+            record.get("reply_to_message_id"),
+            record.get("forwarded_from"),
+            media_type,
+            media_path,
+            record.get("mime_type"),
+            record.get("duration_seconds"),
+            ImportService._timestamp(record, "edited") if "edited" in record else None,
+            int(self_id is not None and sender_id == self_id),
+        )
+
+    @staticmethod
+    def _timestamp(record: Dict[str, Any], field: str) -> int:
+        # Старые экспорты содержат только локальное время без часового пояса
+        unixtime = record.get(f"{field}_unixtime")
+        if unixtime is not None:
+            return int(unixtime)
+        return int(datetime.datetime.fromisoformat(record[field]).timestamp())
+
+    @staticmethod
+    def _text(text) -> str:
+        """Текст бывает строкой или списком из строк и сущностей {"type": ..., "text": ...}."""
+        if isinstance(text, str):
+            return text
+        if isinstance(text, list):
+            return "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+        return ""
+
+    @staticmethod
+    def to_message(row) -> Message:
+        """Строка imported_messages -> та же модель Message, что отдаёт /telegram/chats/{id}/messages."""
+        return Message(
+            id=row["id"],
+            text=row["text"],
+            date=row["date"],
+            sender=Sender(id=row["sender_id"] or 0, name=row["sender_name"]),
+            media_type=row["media_type"],
+            media_url=f"/imports/media/{row['chat_id']}/{row['id']}" if row["media_path"] else None,
+            duration=row["duration"],
+            is_read=True,
+            from_author=bool(row["from_author"]),
+        )
+
+    @staticmethod
+    async def reconcile(client, chat_id: int) -> ImportReconcileResult:
+        """
+        Проверяет, что чат существует в Telegram, и сверяет последние импортированные сообщения
+        с живыми по id и дате: удалённые после экспорта помечаются, расхождения считаются.
+        """
+        chat = ImportRepository.get_chat(chat_id)
+        if chat is None:
+            raise LookupError(f"Chat {chat_id} was not imported")
+        try:
+            entity = await client.get_input_entity(chat_id)
+        except ValueError:
+            # Сущности, которых нет в кэше сессии, становятся известны после загрузки диалогов
+            await TelegramRepository.get_dialogs(client, limit=None)
+            try:
+                entity = await client.get_input_entity(chat_id)
+            except ValueError:
+                ImportRepository.mark_reconciled(chat_id, live=False)
+                return ImportReconcileResult(chat_id=chat_id, live=False, imported_newest_id=chat.newest_message_id)
+
+        sample = ImportRepository.newest(chat_id, RECONCILE_SAMPLE)
+        live_messages = await client.get_messages(entity, ids=[message_id for message_id, _ in sample]) if sample else []
+        result = ImportReconcileResult(chat_id=chat_id, live=True, checked=len(sample),
+                                       imported_newest_id=chat.newest_message_id)
+        deleted = []
+        for (message_id, date), live in zip(sample, live_messages):
+            if live is None:
+                deleted.append(message_id)
+            elif abs(int(live.date.timestamp()) - date) <= 1:
+                result.matched += 1
+            else:
+                result.mismatched += 1
+        result.deleted_live = len(deleted)
+        latest = await client.get_messages(entity, limit=1)
+        result.live_newest_id = latest[0].id if latest else None
+        ImportRepository.mark_reconciled(chat_id, live=True, deleted_ids=deleted)
+        return result
+
+
+async def main():
+    import argparse
+    from telethon import TelegramClient
+    from ..core.config import API_ID, API_HASH, SESSION_NAME
+
+    parser = argparse.ArgumentParser(description="Импорт экспорта Telegram Desktop в локальную базу")
+    parser.add_argument("path", help="Путь к result.json")
+    parser.add_argument("--self-id", type=int, default=None, help="id своего аккаунта (для экспорта одного чата)")
+    parser.add_argument("--reconcile", action="store_true", help="После импорта сверить чаты с Telegram")
+    args = parser.parse_args()
+
+    result = ImportService.import_export(args.path, args.self_id)
+    print(result.model_dump_json(indent=2))
+    if not args.reconcile:
+        return
+    client = TelegramClient(SESSION_NAME, int(API_ID), API_HASH)
+    await client.connect()
+    try:
+        if not await client.is_user_authorized():
+            print(f"Session '{SESSION_NAME}.session' is not authorized, skipping reconciliation.")
+            return
+        for chat_id in result.chat_ids:
+            print((await ImportService.reconcile(client, chat_id)).model_dump_json())
+    finally:
+        await client.disconnect()
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(main())
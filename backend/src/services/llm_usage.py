@@ -0,0 +1,48 @@
+"""
+Учёт фактически потраченных LLM-токенов.
+Фоновая задача открывает счётчик через LLMUsage.track(); каждый вызов LLM внутри неё передаёт ответ
+в LLMUsage.record(), и в счётчик попадают токены промпта и ответа модели из usage_metadata.
+Счётчик живёт в contextvars, поэтому параллельные задачи не смешивают свой расход.
+"""
+from contextvars import ContextVar
+from typing import Any, Optional
+
+
+class TokenCounter:
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.calls = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+class LLMUsage:
+    """Счётчик токенов текущей задачи; вне track() record() ничего не делает."""
+    _current: ContextVar[Optional[TokenCounter]] = ContextVar("llm_usage", default=None)
+
+    @staticmethod
+    def track() -> TokenCounter:
+        """Открывает новый счётчик для текущей задачи (и задач, созданных из неё дальше)."""
+        counter = TokenCounter()
+        LLMUsage._current.set(counter)
+        return counter
+
+    @staticmethod
+    def record(result: Any) -> None:
+        """
+        :param result: Ответ ChatModel.ainvoke (AIMessage) или результат trustcall ({"messages": [...], ...})
+        """
+        counter = LLMUsage._current.get()
+        if counter is None:
+            return
+        messages = result.get("messages", []) if isinstance(result, dict) else [result]
+        for message in messages:
+            usage = getattr(message, 'usage_metadata', None)
+            if not usage:
+                continue
+            counter.input_tokens += usage.get("input_tokens", 0)
+            counter.output_tokens += usage.get("output_tokens", 0)
+            counter.calls += 1
@@ -0,0 +1,289 @@
+"""
+Сервис Notes extractor.
+Потоковый конвейер: новые сообщения (события Telethon или бэкфилл) проходят дешёвый локальный
+скоринг, и только кандидаты пачками отправляются в LLM, которая извлекает заметки и время напоминания.
+"""
+import asyncio
+import datetime
+import os
+import re
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from ..core.config import NOTES_SCORE_THRESHOLD, NOTES_BATCH_SIZE, NOTES_BATCH_WAIT, NOTES_REMINDERS_ENABLED
+from ..repositories.notes import NotesRepository
+from ..repositories.telegram import TelegramRepository
+from ..schemas.notes import NotesPipelineStats, NotesBackfillResult
+from .prompt_encoder import URL_RE
+
+KEYWORDS_RE = re.compile(
+    r"\b(важн|срочн|не забуд|напомн|дедлайн|срок|до конца|встреч|созвон|собеседован|оплат|экзамен|задани|"
+    r"todo|deadline|urgent|asap|remind|meeting|interview|don't forget)",
+    re.IGNORECASE,
+)
+DATE_RE = re.compile(
+    r"\b(\d{1,2}[./]\d{1,2}([./]\d{2,4})?|\d{1,2}:\d{2}|сегодня|завтра|послезавтра|понедельник|вторник|"
+    r"сред[аыу]|четверг|пятниц[аыу]|суббот[аыу]|воскресень[еяю]|today|tomorrow|monday|tuesday|wednesday|thursday|"
+    r"friday|saturday|sunday|\d{1,2}\s+(январ|феврал|март|апрел|ма[яй]|июн|июл|август|сентябр|октябр|ноябр|декабр))",
+    re.IGNORECASE,
+)
+REMINDER_CHECK_INTERVAL = 60
+REMINDER_PREFIX = "⏰ Напоминание:"
+# Неудачная пачка возвращается в очередь с нарастающей паузой; после RETRY_MAX_ATTEMPTS попыток кандидат отбрасывается
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 600
+RETRY_MAX_ATTEMPTS = 5
+
+
+class NoteCandidate(BaseModel):
+    """Сообщение, прошедшее локальный фильтр."""
+    chat_id: int
+    message_id: int
+    sender_name: str
+    text: str
+    date: int
+    score: int
+    attempts: int = 0
+
+
+class NoteScorer:
+    """Локальный скоринг сообщения без обращения к LLM."""
+    @staticmethod
+    def score(msg, me_username: Optional[str] = None) -> int:
+        text = getattr(msg, 'message', None) or ''
+        if not text.strip():
+            return 0
+        score = 0
+        if KEYWORDS_RE.search(text):
+            score += 2
+        if DATE_RE.search(text):
+            score += 2
+        has_link = bool(URL_RE.search(text))
+        if has_link:
+            score += 1
+        if getattr(msg, 'mentioned', False) or (me_username and f"@{me_username.lower()}" in text.lower()):
+            # mentioned выставляется и для ответов на мои сообщения в группах
+            score += 3
+        elif getattr(msg, 'is_private', False) and getattr(msg, 'reply_to_msg_id', None) and not getattr(msg, 'out', False):
+            score += 2
+        if len(text) < 20 and not has_link:
+            score -= 1
+        return score
+
+
+class NotesPipeline:
+    """
+    Конвейер извлечения заметок. Кандидаты копятся в очереди и уходят в LLM пачками
+    до NOTES_BATCH_SIZE сообщений или по истечении NOTES_BATCH_WAIT секунд.
+    """
+    _queue: Optional[asyncio.Queue] = None
+    _tasks: List[asyncio.Task] = []
+    _client = None
+    _me_username: Optional[str] = None
+    _stats = NotesPipelineStats()
+
+    @staticmethod
+    async def start(client) -> None:
+        """
+        Подписывается на новые сообщения и запускает фоновые задачи (повторный вызов ничего не делает).
+        Без OPENAI_API_KEY классифицировать нечем: работают только напоминания по уже сохранённым заметкам.
+        """
+        from telethon import events
+        from .telegram import TelegramService
+
+        if NotesPipeline._client is not None:
+            return
+        me = await TelegramService.get_me(client)
+        NotesPipeline._me_username = getattr(me, 'username', None)
+        NotesPipeline._client = client
+        NotesPipeline._tasks = []
+        if os.getenv("OPENAI_API_KEY"):
+            NotesPipeline._queue = asyncio.Queue()
+            client.add_event_handler(NotesPipeline._on_new_message, events.NewMessage())
+            NotesPipeline._tasks.append(asyncio.create_task(NotesPipeline._worker()))
+        else:
+            print("Notes extractor: OPENAI_API_KEY is not set, new messages are not classified.")
+        if NOTES_REMINDERS_ENABLED:
+            NotesPipeline._tasks.append(asyncio.create_task(NotesPipeline._reminder_loop()))
+
+    @staticmethod
+    async def stop() -> None:
+        if NotesPipeline._client is None:
+            return
+        if NotesPipeline._queue is not None:
+            NotesPipeline._client.remove_event_handler(NotesPipeline._on_new_message)
+        for task in NotesPipeline._tasks:
+            task.cancel()
+        await asyncio.gather(*NotesPipeline._tasks, return_exceptions=True)
+        NotesPipeline._tasks = []
+        NotesPipeline._queue = None
+        NotesPipeline._client = None
+
+    @staticmethod
+    def stats() -> NotesPipelineStats:
+        stats = NotesPipeline._stats
+        stats.queued = NotesPipeline._queue.qsize() if NotesPipeline._queue else 0
+        stats.llm_call_rate = round(stats.llm_calls / stats.received, 4) if stats.received else 0.0
+        return stats
+
+    @staticmethod
+    async def _on_new_message(event) -> None:
+        from .telegram import TelegramService
+
+        # Отправитель запрашивается только для прошедших скоринг: для остальных это лишний запрос к Telegram
+        score = NotesPipeline._score(event.message)
+        if score is None:
+            return
+        sender = await event.get_sender()
+        sender_name = TelegramService._get_sender_name(sender) if sender else str(event.sender_id)
+        NotesPipeline._enqueue(event.message, event.chat_id, sender_name, score)
+
+    @staticmethod
+    def submit(msg, chat_id: int, sender_name: str) -> bool:
+        """Скорит сообщение локально и ставит в очередь, если оно тянет на заметку."""
+        score = NotesPipeline._score(msg)
+        if score is None:
+            return False
+        NotesPipeline._enqueue(msg, chat_id, sender_name, score)
+        return True
+
+    @staticmethod
+    def _score(msg) -> Optional[int]:
+        """Оценка сообщения; None, если до порога NOTES_SCORE_THRESHOLD оно не дотягивает."""
+        if getattr(msg, 'out', False) and (msg.message or '').startswith(REMINDER_PREFIX):
+            return None  # собственные напоминания не должны снова становиться заметками
+        NotesPipeline._stats.received += 1
+        score = NoteScorer.score(msg, NotesPipeline._me_username)
+        return score if score >= NOTES_SCORE_THRESHOLD else None
+
+    @staticmethod
+    def _enqueue(msg, chat_id: int, sender_name: str, score: int) -> None:
+        NotesPipeline._stats.candidates += 1
+        NotesPipeline._queue.put_nowait(NoteCandidate(
+            chat_id=chat_id,
+            message_id=msg.id,
+            sender_name=sender_name,
+            text=msg.message,
+            date=int(msg.date.timestamp()),
+            score=score,
+        ))
+
+    @staticmethod
+    async def backfill(client, chat_id: int, limit: int) -> NotesBackfillResult:
+        """Прогоняет через конвейер последние limit сообщений чата."""
+        from .telegram import TelegramService
+
+        await NotesPipeline.start(client)
+        if NotesPipeline._queue is None:
+            raise RuntimeError("OPENAI_API_KEY не найден в переменных окружения.")
+        messages = await TelegramRepository.get_messages(client, chat_id, limit=limit)
+        candidates = 0
+        for m in sorted(messages, key=lambda m: m.date):
+            sender_name = TelegramService._get_sender_name(m.sender) if getattr(m, 'sender', None) else str(m.sender_id)
+            if NotesPipeline.submit(m, chat_id, sender_name):
+                candidates += 1
+        return NotesBackfillResult(scanned=len(messages), candidates=candidates)
+
+    @staticmethod
+    async def _worker() -> None:
+        queue = NotesPipeline._queue
+        loop = asyncio.get_running_loop()
+        delay = 0
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + NOTES_BATCH_WAIT
+            while len(batch) < NOTES_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await NotesPipeline._classify(batch)
+                delay = 0
+            except Exception as e:
+                delay = min(max(delay * 2, RETRY_BASE_DELAY), RETRY_MAX_DELAY)
+                print(f"Notes extractor: failed to classify batch of {len(batch)}, retrying in {delay}s: {e}")
+                NotesPipeline._requeue(batch)
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _requeue(batch: List[NoteCandidate]) -> None:
+        """Возвращает непроверенных кандидатов в очередь, пока не исчерпан лимит попыток."""
+        for c in batch:
+            c.attempts += 1
+            if c.attempts >= RETRY_MAX_ATTEMPTS:
+                NotesPipeline._stats.dropped += 1
+                print(f"Notes extractor: dropping message {c.message_id} in chat {c.chat_id} after {c.attempts} attempts")
+            else:
+                NotesPipeline._queue.put_nowait(c)
+
+    @staticmethod
+    async def _classify(batch: List[NoteCandidate]) -> None:
+        """Один вызов LLM на пачку кандидатов; найденные заметки сохраняются."""
+        from langchain_openai import ChatOpenAI
+        from trustcall import create_extractor
+        from ..schemas.notes import NotesExtraction
+
+        checked = NotesRepository.checked((c.chat_id, c.message_id) for c in batch)
+        batch = [c for c in batch if (c.chat_id, c.message_id) not in checked]
+        if not batch:
+            return
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY не найден в переменных окружения.")
+        llm = ChatOpenAI(model="gpt-4.1-mini", api_key=api_key)
+        bound = create_extractor(llm, tools=[NotesExtraction], tool_choice="NotesExtraction")
+        lines = []
+        for i, c in enumerate(batch):
+            date = datetime.datetime.fromtimestamp(c.date, tz=datetime.timezone.utc).isoformat(timespec="minutes")
+            text = " ".join(c.text.split())[:1000]
+            lines.append(f"[{i}] ({date}) {c.sender_name}: {text}")
+        messages = "\n".join(lines)
+        prompt = (
+            f"""Для каждого сообщения из списка реши, стоит ли сохранить его как заметку: задача, дедлайн, встреча, полезная ссылка или важная информация для меня. Для заметок придумай короткий заголовок на русском и, если в сообщении есть срок или время, укажи когда напомнить (относительные даты считай от даты сообщения).\n<messages>\n{messages}\n</messages>"""
+        )
+        NotesPipeline._stats.llm_calls += 1
+        result = await bound.ainvoke(prompt)
+        if not result or not result.get("responses"):
+            raise RuntimeError("LLM не вернул валидный ответ для Notes extractor.")
+
+        for extracted in result["responses"][0].notes:
+            if not extracted.is_note or not 0 <= extracted.index < len(batch):
+                continue
+            c = batch[extracted.index]
+            if NotesRepository.add(
+                c.chat_id, c.message_id, c.sender_name, c.text, extracted.title or c.text[:80],
+                extracted.category.value, c.date, NotesPipeline._parse_remind_at(extracted.remind_at),
+            ):
+                NotesPipeline._stats.notes_saved += 1
+        NotesRepository.mark_checked((c.chat_id, c.message_id) for c in batch)
+
+    @staticmethod
+    def _parse_remind_at(value: Optional[str]) -> Optional[int]:
+        if not value:
+            return None
+        try:
+            remind_at = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if remind_at.tzinfo is None:
+            remind_at = remind_at.replace(tzinfo=datetime.timezone.utc)
+        return int(remind_at.timestamp())
+
+    @staticmethod
+    async def _reminder_loop() -> None:
+        """Раз в минуту отправляет наступившие напоминания в «Избранное»."""
+        while True:
+            try:
+                for note in NotesRepository.pending_reminders(int(time.time())):
+                    await NotesPipeline._client.send_message("me", f"{REMINDER_PREFIX} {note.title}\n\n{note.sender_name}: {note.text}")
+                    NotesRepository.mark_reminded(note.id)
+            except Exception as e:
+                print(f"Notes extractor: failed to send reminders: {e}")
+            await asyncio.sleep(REMINDER_CHECK_INTERVAL)
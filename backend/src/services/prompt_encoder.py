@@ -0,0 +1,184 @@
+"""
+Кодировщики переписки для промптов LLM.
+Превращают сообщения Telethon в текст, укладываясь в бюджет токенов, и считают,
+сколько токенов сэкономлено относительно исходного формата "[YYYY.MM.DD HH:MM] Name: text".
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Set
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+from ..core.config import PROMPT_ENCODER
+
+URL_RE = re.compile(r"https?://\S+")
+EMOJI_RUN_RE = re.compile(r"[\U0001F000-\U0001FAFF\u2600-\u27BF\uFE0F\u200D]{4,}")
+# Сообщения одного отправителя с паузой меньше этой склеиваются в один блок
+COLLAPSE_WINDOW = 5 * 60
+MAX_URL_LENGTH = 40
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Токенизатор tiktoken (загрузка словаря дорогая, поэтому кэшируется)."""
+    import tiktoken
+    return tiktoken.encoding_for_model("gpt-4o")
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text)) if text else 0
+
+
+def message_text(msg) -> Optional[str]:
+    return getattr(msg, 'text', None) or getattr(msg, 'message', None)
+
+
+def sender_name(msg) -> str:
+    sender = getattr(msg, 'sender', None)
+    return getattr(sender, 'first_name', None) or getattr(sender, 'username', None) or str(msg.sender_id)
+
+
+class EncodedConversation(BaseModel):
+    """Результат кодирования переписки для промпта."""
+    text: str
+    message_count: int
+    tokens: int
+    baseline_tokens: int  # токены тех же сообщений в исходном формате
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.baseline_tokens - self.tokens
+
+
+class PromptEncoder:
+    """
+    Базовый кодировщик: исходный формат, по строке на сообщение.
+    Наследники переопределяют render(); отбор сообщений под бюджет общий.
+    """
+    name = "plain"
+
+    def render(self, messages) -> str:
+        lines = []
+        for m in messages:
+            lines.append(f"[{m.date.strftime('%Y.%m.%d %H:%M')}] {sender_name(m)}: {message_text(m)}")
+        return "\n".join(lines)
+
+    def encode(self, messages, max_tokens: int) -> EncodedConversation:
+        """
+        Кодирует текстовые сообщения (от старых к новым), отбрасывая самые старые,
+        пока результат не уложится в max_tokens.
+        """
+        ordered = sorted((m for m in messages if message_text(m)), key=lambda m: m.date)
+        text = self.render(ordered)
+        tokens = count_tokens(text)
+        start = 0
+        if tokens > max_tokens:
+            # Бинарный поиск самого раннего сообщения, с которого переписка помещается в бюджет
+            lo, hi = 1, len(ordered)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if count_tokens(self.render(ordered[mid:])) <= max_tokens:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            start = lo
+            text = self.render(ordered[start:])
+            tokens = count_tokens(text)
+        selected = ordered[start:]
+        baseline = tokens if type(self) is PromptEncoder else count_tokens(PromptEncoder.render(self, selected))
+        return EncodedConversation(text=text, message_count=len(selected), tokens=tokens, baseline_tokens=baseline)
+
+
+class CompactPromptEncoder(PromptEncoder):
+    """
+    Компактный формат: короткие алиасы отправителей с легендой, заголовки дней,
+    относительное время, склейка подряд идущих сообщений одного отправителя,
+    сокращение и дедупликация ссылок и пересланных сообщений, сжатие серий эмодзи.
+    """
+    name = "compact"
+
+    def render(self, messages) -> str:
+        if not messages:
+            return ""
+        aliases = self._aliases(messages)
+        legend = "; ".join(f"{alias}={name}" for name, alias in aliases.items())
+        lines = [
+            f"Участники: {legend}",
+            "Формат: '## дата' — новый день, 'ЧЧ:ММ' — время, '+Nм' — через N минут после предыдущего сообщения, строки с отступом — продолжение того же автора.",
+        ]
+        seen_urls: Set[str] = set()
+        seen_forwards = set()
+        prev = None
+        for m in messages:
+            if getattr(m, 'fwd_from', None):
+                key = " ".join(message_text(m).split()).lower()
+                if key in seen_forwards:
+                    continue
+                seen_forwards.add(key)
+            text = self._compact_text(message_text(m), seen_urls)
+            if getattr(m, 'fwd_from', None):
+                text = f"[переслано] {text}"
+            name = sender_name(m)
+            day = m.date.strftime("%Y.%m.%d")
+            if prev is None or prev.date.strftime("%Y.%m.%d") != day:
+                lines.append(f"## {day}")
+                lines.append(f"{m.date.strftime('%H:%M')} {aliases[name]}: {text}")
+            elif sender_name(prev) == name and (m.date - prev.date).total_seconds() <= COLLAPSE_WINDOW:
+                lines.append(f"  {text}")
+            else:
+                lines.append(f"{self._time(m.date, prev.date)} {aliases[name]}: {text}")
+            prev = m
+        return "\n".join(lines)
+
+    @staticmethod
+    def _aliases(messages) -> Dict[str, str]:
+        """Алиасы A, B, ..., Z, A1, ... — чаще пишущим достаются более короткие."""
+        counts: Dict[str, int] = {}
+        for m in messages:
+            name = sender_name(m)
+            counts[name] = counts.get(name, 0) + 1
+        aliases = {}
+        for i, name in enumerate(sorted(counts, key=counts.get, reverse=True)):
+            letter = chr(ord("A") + i % 26)
+            aliases[name] = letter if i < 26 else f"{letter}{i // 26}"
+        return aliases
+
+    @staticmethod
+    def _time(date, prev_date) -> str:
+        """'+Nм' для коротких пауз; после паузы от часа — абсолютное время, чтобы ошибка не накапливалась."""
+        minutes = int((date - prev_date).total_seconds() // 60)
+        if minutes < 60:
+            return f"+{minutes}м"
+        return date.strftime("%H:%M")
+
+    @staticmethod
+    def _compact_text(text: str, seen_urls: Set[str]) -> str:
+        def shorten(match):
+            url = match.group(0)
+            parts = urlsplit(url)
+            if url in seen_urls:
+                return f"[та же ссылка {parts.netloc}]"
+            seen_urls.add(url)
+            short = f"{parts.netloc}{parts.path}".rstrip("/")
+            if len(short) > MAX_URL_LENGTH:
+                short = short[:MAX_URL_LENGTH] + "…"
+            return short
+
+        text = URL_RE.sub(shorten, text)
+        text = EMOJI_RUN_RE.sub(lambda match: match.group(0)[:3], text)
+        return " / ".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+PROMPT_ENCODERS: Dict[str, PromptEncoder] = {
+    PromptEncoder.name: PromptEncoder(),
+    CompactPromptEncoder.name: CompactPromptEncoder(),
+}
+
+
+def get_prompt_encoder(name: Optional[str] = None) -> PromptEncoder:
+    """Кодировщик по имени (по умолчанию — из настройки PROMPT_ENCODER)."""
+    encoder = PROMPT_ENCODERS.get(name or PROMPT_ENCODER)
+    if encoder is None:
+        raise ValueError(f"Unknown prompt encoder: {name}. Available: {', '.join(PROMPT_ENCODERS)}")
+    return encoder
@@ -0,0 +1,230 @@
+"""
+Планировщик предрасчёта AI-результатов.
+Учится, какие чаты чаще открывают и где чаще пишут, и в простое заранее считает для них
+LLM-summary и обновляет Persona Mirror — в рамках бюджета токенов и лимита параллельности.
+При росте интерактивной нагрузки новые задачи не запускаются, а интервал проверки растёт.
+"""
+import asyncio
+import math
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..core.config import (
+    PRECOMPUTE_ENABLED, PRECOMPUTE_TOKEN_BUDGET_PER_HOUR, PRECOMPUTE_CONCURRENCY,
+    PRECOMPUTE_IDLE_SECONDS, PRECOMPUTE_PERSONA_MIN_NEW_MESSAGES,
+)
+from ..repositories.access import AccessStatsRepository
+from ..schemas.telegram import HotChat, PrecomputeStatus
+from .llm_usage import LLMUsage
+
+SUMMARY_TARGET = "summary"
+PERSONA_TARGET_PREFIX = "persona:"
+# Счётчик обращений уменьшается вдвое за 3 дня
+ACCESS_HALF_LIFE = 3 * 24 * 3600
+MIN_ACCESS_SCORE = 0.5
+HOT_CHATS_LIMIT = 10
+TICK_INTERVAL = 30
+MAX_BACKOFF = 600
+# Оценки стоимости задачи до её запуска; по завершении резерв заменяется фактическим расходом
+SUMMARY_TOKENS_ESTIMATE = 4000
+PERSONA_TOKENS_ESTIMATE = 8000
+
+
+class PrecomputeScheduler:
+    """Фоновый предрасчёт summary и Persona Mirror для горячих чатов."""
+    _access: Dict[Tuple[int, str], Tuple[float, int]] = {}  # (chat_id, target) -> (score, updated_at)
+    _new_messages: Dict[int, int] = {}  # chat_id -> сколько сообщений пришло с запуска
+    _baseline: Dict[Tuple[int, str], int] = {}  # значение _new_messages на момент последнего расчёта
+    _token_log: List[Tuple[float, int]] = []
+    _running: Set[Tuple[int, str]] = set()
+    _jobs: Set[asyncio.Task] = set()
+    _completed = 0
+    _in_flight = 0
+    _last_request = 0.0
+    _backoff = 0.0
+    _client = None
+    _task: Optional[asyncio.Task] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    async def start(client) -> None:
+        """Загружает статистику обращений, подписывается на новые сообщения и запускает цикл."""
+        from telethon import events
+
+        if not PRECOMPUTE_ENABLED or PrecomputeScheduler._task is not None:
+            return
+        for chat_id, target, score, updated_at in AccessStatsRepository.all():
+            PrecomputeScheduler._access[(chat_id, target)] = (score, updated_at)
+        PrecomputeScheduler._client = client
+        PrecomputeScheduler._semaphore = asyncio.Semaphore(PRECOMPUTE_CONCURRENCY)
+        client.add_event_handler(PrecomputeScheduler._on_new_message, events.NewMessage())
+        PrecomputeScheduler._task = asyncio.create_task(PrecomputeScheduler._loop())
+
+    @staticmethod
+    async def stop() -> None:
+        if PrecomputeScheduler._task is None:
+            return
+        PrecomputeScheduler._client.remove_event_handler(PrecomputeScheduler._on_new_message)
+        tasks = [PrecomputeScheduler._task, *PrecomputeScheduler._jobs]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        PrecomputeScheduler._task = None
+        PrecomputeScheduler._jobs.clear()
+        PrecomputeScheduler._running.clear()
+
+    # --- Сигналы нагрузки и интереса ---
+    @staticmethod
+    def request_started() -> None:
+        PrecomputeScheduler._in_flight += 1
+        PrecomputeScheduler._last_request = time.monotonic()
+
+    @staticmethod
+    def request_finished() -> None:
+        PrecomputeScheduler._in_flight -= 1
+        PrecomputeScheduler._last_request = time.monotonic()
+
+    @staticmethod
+    def record_access(chat_id: int, target: str) -> None:
+        """Отмечает, что пользователь открыл AI-результат чата (он же только что стал актуальным)."""
+        now = int(time.time())
+        key = (chat_id, target)
+        score = PrecomputeScheduler._decayed(key, now) + 1.0
+        PrecomputeScheduler._access[key] = (score, now)
+        PrecomputeScheduler._baseline[key] = PrecomputeScheduler._new_messages.get(chat_id, 0)
+        AccessStatsRepository.save(chat_id, target, score, now)
+
+    @staticmethod
+    async def _on_new_message(event) -> None:
+        PrecomputeScheduler._new_messages[event.chat_id] = PrecomputeScheduler._new_messages.get(event.chat_id, 0) + 1
+
+    # --- Состояние ---
+    @staticmethod
+    def is_idle() -> bool:
+        return (
+            PrecomputeScheduler._in_flight == 0
+            and time.monotonic() - PrecomputeScheduler._last_request >= PRECOMPUTE_IDLE_SECONDS
+        )
+
+    @staticmethod
+    def tokens_used_last_hour() -> int:
+        cutoff = time.monotonic() - 3600
+        PrecomputeScheduler._token_log = [entry for entry in PrecomputeScheduler._token_log if entry[0] >= cutoff]
+        return sum(tokens for _, tokens in PrecomputeScheduler._token_log)
+
+    @staticmethod
+    def hot_chats() -> List[HotChat]:
+        """Цели по убыванию интереса: затухающий счётчик обращений, усиленный числом новых сообщений."""
+        now = int(time.time())
+        result = []
+        for key in PrecomputeScheduler._access:
+            access = PrecomputeScheduler._decayed(key, now)
+            if access < MIN_ACCESS_SCORE:
+                continue
+            new_messages = PrecomputeScheduler._new_since_baseline(key)
+            result.append(HotChat(
+                chat_id=key[0],
+                target=key[1],
+                score=round(access * (1 + math.log1p(new_messages)), 3),
+                new_messages=new_messages,
+            ))
+        return sorted(result, key=lambda h: h.score, reverse=True)
+
+    @staticmethod
+    def status() -> PrecomputeStatus:
+        return PrecomputeStatus(
+            enabled=PrecomputeScheduler._task is not None,
+            idle=PrecomputeScheduler.is_idle(),
+            in_flight_requests=PrecomputeScheduler._in_flight,
+            backoff_seconds=PrecomputeScheduler._backoff,
+            running_jobs=len(PrecomputeScheduler._running),
+            tokens_used_last_hour=PrecomputeScheduler.tokens_used_last_hour(),
+            token_budget_per_hour=PRECOMPUTE_TOKEN_BUDGET_PER_HOUR,
+            completed_jobs=PrecomputeScheduler._completed,
+            hot_chats=PrecomputeScheduler.hot_chats()[:HOT_CHATS_LIMIT],
+        )
+
+    @staticmethod
+    def _decayed(key: Tuple[int, str], now: int) -> float:
+        score, updated_at = PrecomputeScheduler._access.get(key, (0.0, now))
+        return score * 0.5 ** ((now - updated_at) / ACCESS_HALF_LIFE)
+
+    @staticmethod
+    def _new_since_baseline(key: Tuple[int, str]) -> int:
+        return PrecomputeScheduler._new_messages.get(key[0], 0) - PrecomputeScheduler._baseline.get(key, 0)
+
+    # --- Цикл ---
+    @staticmethod
+    async def _loop() -> None:
+        while True:
+            await asyncio.sleep(TICK_INTERVAL + PrecomputeScheduler._backoff)
+            if not PrecomputeScheduler.is_idle():
+                PrecomputeScheduler._backoff = min(MAX_BACKOFF, max(TICK_INTERVAL, PrecomputeScheduler._backoff * 2))
+                continue
+            PrecomputeScheduler._backoff = 0.0
+            try:
+                PrecomputeScheduler._tick()
+            except Exception as e:
+                print(f"Precompute scheduler tick failed: {e}")
+
+    @staticmethod
+    def _tick() -> None:
+        """Запускает задачи для самых горячих целей, пока позволяют простой, бюджет и параллельность."""
+        if not os.getenv("OPENAI_API_KEY"):
+            return
+        for hot in PrecomputeScheduler.hot_chats()[:HOT_CHATS_LIMIT]:
+            if not PrecomputeScheduler.is_idle() or len(PrecomputeScheduler._running) >= PRECOMPUTE_CONCURRENCY:
+                break
+            key = (hot.chat_id, hot.target)
+            if key in PrecomputeScheduler._running or not PrecomputeScheduler._needs_refresh(key, hot.new_messages):
+                continue
+            estimate = SUMMARY_TOKENS_ESTIMATE if hot.target == SUMMARY_TARGET else PERSONA_TOKENS_ESTIMATE
+            if PrecomputeScheduler.tokens_used_last_hour() + estimate > PRECOMPUTE_TOKEN_BUDGET_PER_HOUR:
+                break
+            PrecomputeScheduler._token_log.append((time.monotonic(), estimate))
+            PrecomputeScheduler._running.add(key)
+            # Ссылка на задачу нужна, чтобы её не собрал GC и чтобы stop() мог её отменить
+            job = asyncio.create_task(PrecomputeScheduler._run(key, estimate))
+            PrecomputeScheduler._jobs.add(job)
+            job.add_done_callback(PrecomputeScheduler._jobs.discard)
+
+    @staticmethod
+    def _needs_refresh(key: Tuple[int, str], new_messages: int) -> bool:
+        from .telegram import TelegramService
+        from ..repositories.persona import PersonaProfileRepository
+
+        chat_id, target = key
+        if target == SUMMARY_TARGET:
+            return new_messages > 0 or TelegramService.summary_key(chat_id) not in TelegramService._summary_cache
+        person = target[len(PERSONA_TARGET_PREFIX):]
+        return (
+            new_messages >= PRECOMPUTE_PERSONA_MIN_NEW_MESSAGES
+            or PersonaProfileRepository.get(chat_id, person) is None
+        )
+
+    @staticmethod
+    async def _run(key: Tuple[int, str], estimate: int) -> None:
+        from .telegram import TelegramService
+        from ..schemas.telegram import SummaryMode
+
+        chat_id, target = key
+        usage = LLMUsage.track()
+        try:
+            async with PrecomputeScheduler._semaphore:
+                baseline = PrecomputeScheduler._new_messages.get(chat_id, 0)
+                if target == SUMMARY_TARGET:
+                    await TelegramService.summarize_chat(PrecomputeScheduler._client, chat_id, mode=SummaryMode.LLM)
+                else:
+                    person = target[len(PERSONA_TARGET_PREFIX):]
+                    await TelegramService.analyze_persona_mirror(PrecomputeScheduler._client, chat_id, person)
+                PrecomputeScheduler._baseline[key] = baseline
+                PrecomputeScheduler._completed += 1
+        except Exception as e:
+            print(f"Precompute of {target} for chat {chat_id} failed: {e}")
+        finally:
+            # Поправка резерва до фактического расхода (промпт и ответ, все вызовы LLM задачи);
+            # если модель не сообщила usage, резерв остаётся как есть
+            if usage.calls:
+                PrecomputeScheduler._token_log.append((time.monotonic(), usage.total_tokens - estimate))
+            PrecomputeScheduler._running.discard(key)
@@ -3,14 +3,37 @@
 """
 import datetime
 from ..repositories.telegram import TelegramRepository
-from ..schemas.telegram import Chat, Message, ChatType, Sender, AuthStatus, PhoneCodeHash, UserProfileInsights, ChatSummary
+from ..schemas.telegram import Chat, Message, ChatType, Sender, AuthStatus, PhoneCodeHash, PersonaMirrorResult, ChatSummary, SummaryMode
+from .llm_usage import LLMUsage
+from .prompt_encoder import get_prompt_encoder
+from .versions import VersionRegistry
 from telethon.tl.types import User as TelethonUser, Chat as TelethonChat, Channel as TelethonChannel
 from telethon.errors.rpcerrorlist import SessionPasswordNeededError, PhoneCodeInvalidError
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from fastapi import Request, HTTPException
 
+# Сколько последних сообщений анализирует полная пересборка Persona Mirror
+PERSONA_HISTORY_LIMIT = 400
+# Верхняя граница символов на токен: длиннее такой префикс заведомо не влезет в бюджет,
+# и бинарный поиск пачки не рендерит и не токенизирует его
+MAX_CHARS_PER_TOKEN = 8
+
 class TelegramService:
     """Business logic for Telegram operations."""
+    # Готовые LLM-summary: (chat_id, max_tokens, кодировщик) -> (id самого нового сообщения на момент расчёта, summary)
+    _summary_cache: Dict[Tuple[int, int, str], Tuple[int, ChatSummary]] = {}
+    _summary_tasks: Dict[Tuple[int, int, str], "asyncio.Task"] = {}
+    # Текущий пользователь и статистика непрочитанных (действительна, пока не изменилась версия диалогов)
+    _me = None
+    _chats_stats_cache: Optional[Tuple[str, Dict[str, object]]] = None
+
+    @staticmethod
+    async def get_me(client):
+        """get_me с кэшем: Telethon запрашивает пользователя у сервера при каждом вызове."""
+        if TelegramService._me is None:
+            TelegramService._me = await client.get_me()
+        return TelegramService._me
+
     @staticmethod
     async def get_chats(client, filter_type: ChatType, limit: int, offset_id: int = None, offset_date: int = None, offset_peer_type: str = None, offset_peer_id: int = None):
         """Get a list of chats filtered by type (with avatar_url) with pagination support."""
@@ -123,6 +146,10 @@ class TelegramService:
     @staticmethod
     async def get_chats_stats(client) -> Dict[str, object]:
         """Get unread messages statistics by chat type."""
+        version = VersionRegistry.dialogs_etag()
+        cached = TelegramService._chats_stats_cache
+        if version is not None and cached and cached[0] == version:
+            return cached[1]
         dialogs = await TelegramRepository.get_dialogs(client, limit=1000)  # Получаем до 1000 чатов для статистики
         stats = {"personal_unread": 0, "group_unread": 0, "channel_unread": 0}
         for dialog in dialogs:
@@ -132,6 +159,8 @@ class TelegramService:
                 stats["group_unread"] += dialog.unread_count or 0
             elif dialog.is_channel:
                 stats["channel_unread"] += dialog.unread_count or 0
+        if version is not None:
+            TelegramService._chats_stats_cache = (version, stats)
         return stats
 
     @staticmethod
@@ -194,7 +223,7 @@ class TelegramService:
         if is_read is None:
             is_read = not getattr(msg, 'unread', False)
         # Определяем, от автора ли сообщение
-        me = await client.get_me()
+        me = await TelegramService.get_me(client)
         from_author = (sender_id == me.id) if sender_id and me else False
         return Message(
             id=msg.id,
@@ -238,14 +267,15 @@ class TelegramService:
             await client.connect()
         try:
             await client.sign_in(phone=phone_number, code=code, phone_code_hash=phone_code_hash)
-            me = await client.get_me()
+            # Кэш мог остаться от предыдущего аккаунта
+            TelegramService._me = me = await client.get_me()
             return AuthStatus(is_authorized=True, user_id=me.id, phone=me.phone)
         except SessionPasswordNeededError:
             if not password:
                 raise HTTPException(status_code=400, detail="Password is required for 2FA.")
             try:
                 await client.sign_in(password=password)
-                me = await client.get_me()
+                TelegramService._me = me = await client.get_me()
                 return AuthStatus(is_authorized=True, user_id=me.id, phone=me.phone)
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Failed to sign in with password: {str(e)}")
@@ -274,54 +304,62 @@ class TelegramService:
 
         if await client.is_user_authorized():
             await client.log_out()
+            TelegramService._me = None
             return AuthStatus(is_authorized=False, detail="Successfully logged out.")
         return AuthStatus(is_authorized=False, detail="User was not logged in.")
 
     @staticmethod
-    async def analyze_persona_mirror(client, chat_id: int, analyze_person: str = "Aidin Khan", max_tokens: int = 40000) -> dict:
+    async def analyze_persona_mirror(client, chat_id: int, analyze_person: str = "Aidin Khan", max_tokens: int = 40000, force_rebuild: bool = False, encoder: Optional[str] = None) -> PersonaMirrorResult:
         """
         Анализирует последние сообщения в чате и возвращает краткий портрет собеседника (Persona Mirror) с помощью LLM.
+        Профиль сохраняется по паре (чат, человек): следующие вызовы отправляют в LLM только новые сообщения
+        и существующий профиль, который trustcall обновляет патчем (если новых сообщений больше бюджета токенов —
+        несколькими патчами по очереди). Раз в PERSONA_FULL_REBUILD_EVERY обновлений профиль пересобирается
+        целиком, чтобы не накапливался дрейф.
         :param client: TelegramClient
         :param chat_id: ID чата
         :param analyze_person: 'self' или username/имя собеседника
         :param max_tokens: Максимальное количество токенов для анализа (по умолчанию 40k)
-        :return: Словарь с результатами анализа (UserProfileInsights)
+        :param force_rebuild: Пересобрать профиль с нуля, игнорируя сохранённый
+        :param encoder: Кодировщик переписки для промпта (по умолчанию из PROMPT_ENCODER)
+        :return: Профиль (UserProfileInsights) с числом токенов переписки в промптах и сэкономленных кодировщиком
         """
+        import asyncio
         import os
-        import tiktoken
         from langchain_openai import ChatOpenAI
         from trustcall import create_extractor
         from ..schemas.telegram import UserProfileInsights
+        from ..repositories.persona import PersonaProfileRepository
+        from ..core.config import PERSONA_FULL_REBUILD_EVERY, PERSONA_MAX_PATCH_ROUNDS
+        from .analytics import ChatAnalyticsService
+
+        prompt_encoder = get_prompt_encoder(encoder)
+        stored = None if force_rebuild else PersonaProfileRepository.get(chat_id, analyze_person)
+        incremental = stored is not None and stored.updates_since_rebuild < PERSONA_FULL_REBUILD_EVERY
+        if incremental:
+            # Сообщения новее последнего проанализированного, но не больше, чем помещается в допустимые патчи:
+            # если их больше, профиль всё равно пересобирается, и дочитывать их незачем
+            limit = PERSONA_MAX_PATCH_ROUNDS * PERSONA_HISTORY_LIMIT
+            messages = await TelegramRepository.get_messages(client, chat_id, limit=limit + 1, min_id=stored.last_message_id)
+            if not any(getattr(m, 'message', None) for m in messages):
+                return PersonaMirrorResult(**stored.profile)
+            rounds = None
+            if len(messages) <= limit:
+                # Токенизация больших пачек — CPU, не блокируем event loop
+                rounds = await asyncio.to_thread(
+                    TelegramService._persona_rounds, messages, prompt_encoder, max_tokens, PERSONA_MAX_PATCH_ROUNDS
+                )
+            if rounds is None:
+                print(f"Persona Mirror: {len(messages)}+ new messages need more than {PERSONA_MAX_PATCH_ROUNDS} patch rounds, rebuilding from scratch")
+                incremental = False
+        if not incremental:
+            # Последние сообщения; самые старые отбрасываются, если не помещаются в бюджет токенов
+            messages = await TelegramRepository.get_messages(client, chat_id, limit=PERSONA_HISTORY_LIMIT)
+            rounds = [messages]
+
+        # Статистика активности: по уже загруженной истории чата, если она есть, иначе по полученным сообщениям
+        activity = ChatAnalyticsService.describe_for_prompt(await ChatAnalyticsService.for_prompt(client, chat_id, messages))
 
-        # Получаем последние 500 сообщений (или меньше, если токенов много)
-        messages = await TelegramRepository.get_messages(client, chat_id, limit=400)
-        # Собираем текстовую переписку (только текстовые сообщения, без пустых)
-        conversation_lines = []
-        for m in messages:
-            text = getattr(m, 'text', None) or getattr(m, 'message', None)
-            if text:
-                sender = getattr(m.sender, 'first_name', None) or getattr(m.sender, 'username', None) or str(m.sender_id)
-                timestamp = m.date.strftime("%Y.%m.%d %H:%M")  # Формат: ГГГГ.ММ.ДД ЧЧ:ММ:СС
-                conversation_lines.append(f"[{timestamp}] {sender}: {text}")
-        conversation = "\n".join(conversation_lines)
-       
-        # Ограничение по токенам (используем tiktoken для подсчёта)
-        enc = tiktoken.encoding_for_model("gpt-4o")
-        tokens = enc.encode(conversation)
-        # Если переписка превышает лимит, обрезаем только последние сообщения, чтобы не тратить лишние токены
-        if len(tokens) > max_tokens:
-            # Находим границу по строкам, чтобы не обрезать середину сообщения
-            # Обрезаем conversation_lines с конца, пока не уложимся в лимит
-            total_tokens = 0
-            selected_lines = []
-            for line in reversed(conversation_lines):
-                line_tokens = len(enc.encode(line))
-                if total_tokens + line_tokens > max_tokens:
-                    break
-                selected_lines.append(line)
-                total_tokens += line_tokens
-            conversation = "\n".join(reversed(selected_lines))
-     
         # Настройка LLM
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -332,63 +370,195 @@ class TelegramService:
             tools=[UserProfileInsights],
             tool_choice="UserProfileInsights",
         )
-        prompt = (
-            f"""In russian extract the insights from the following conversation, you should analyze '{analyze_person} in that conversation not other person':\n<convo>\n{conversation}\n</convo>"""
-        )
-        result = bound.invoke(prompt)
-  
-        # Проверяем структуру ответа
-        if not result or "responses" not in result or not result["responses"]:
-            raise RuntimeError("LLM не вернул валидный ответ для Persona Mirror.")
-        return result["responses"][0]
+        existing = stored.profile if incremental else None
+        updates_since_rebuild = stored.updates_since_rebuild + 1 if incremental else 0
+        prompt_tokens = tokens_saved = 0
+        for batch in rounds:
+            encoded = prompt_encoder.encode(batch, max_tokens)
+            prompt_tokens += encoded.tokens
+            tokens_saved += encoded.tokens_saved
+            conversation = encoded.text
+            print(f"Persona Mirror prompt: {encoded.message_count} messages, {encoded.tokens} tokens ({encoded.tokens_saved} saved by '{prompt_encoder.name}' encoder)")
+            if existing is not None:
+                prompt = (
+                    f"""In russian update the existing insights about '{analyze_person}' using the new messages from the conversation below. Keep everything that is still valid, add new evidence and correct what the new messages contradict. Analyze '{analyze_person}' in that conversation not other person:\n<convo>\n{conversation}\n</convo>"""
+                )
+            else:
+                prompt = (
+                    f"""In russian extract the insights from the following conversation, you should analyze '{analyze_person} in that conversation not other person':\n<convo>\n{conversation}\n</convo>"""
+                )
+            if activity:
+                prompt += f"""\nPrecomputed activity statistics for this chat (use them for activity-related insights):\n<activity>\n{activity}\n</activity>"""
+            if existing is not None:
+                result = await bound.ainvoke({
+                    "messages": [("user", prompt)],
+                    "existing": {"UserProfileInsights": existing},
+                })
+            else:
+                result = await bound.ainvoke(prompt)
+            LLMUsage.record(result)
+
+            # Проверяем структуру ответа
+            if not result or "responses" not in result or not result["responses"]:
+                raise RuntimeError("LLM не вернул валидный ответ для Persona Mirror.")
+            existing = result["responses"][0].model_dump()
+            # Сохраняем после каждой пачки, чтобы при сбое следующей не анализировать её заново
+            last_message_id = max([m.id for m in batch], default=stored.last_message_id if stored else 0)
+            PersonaProfileRepository.save(chat_id, analyze_person, existing, last_message_id, updates_since_rebuild)
+        return PersonaMirrorResult(**existing, prompt_tokens=prompt_tokens, tokens_saved=tokens_saved)
 
     @staticmethod
-    async def summarize_chat(client, chat_id: int, max_tokens: int = 4000) -> dict:
+    def _persona_rounds(messages, prompt_encoder, max_tokens: int, max_rounds: int) -> Optional[list]:
+        """
+        Делит сообщения от старых к новым на пачки, каждая из которых укладывается в max_tokens.
+        :return: Пачки или None, если их понадобилось бы больше max_rounds (дальше пачки не считаются)
+        """
+        from .prompt_encoder import count_tokens, message_text
+
+        def fits(batch) -> bool:
+            texts = sorted((m for m in batch if message_text(m)), key=lambda m: m.date)
+            return count_tokens(prompt_encoder.render(texts)) <= max_tokens
+
+        remaining = sorted(messages, key=lambda m: m.id)
+        rounds = []
+        while remaining:
+            if len(rounds) == max_rounds:
+                return None
+            # Префикс длиннее max_tokens * MAX_CHARS_PER_TOKEN символов текста заведомо не помещается
+            hi, chars = 0, 0
+            while hi < len(remaining) and chars <= max_tokens * MAX_CHARS_PER_TOKEN:
+                chars += len(message_text(remaining[hi]) or '')
+                hi += 1
+            # Самый длинный префикс, помещающийся в бюджет (хотя бы одно сообщение)
+            lo = 1
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if fits(remaining[:mid]):
+                    lo = mid
+                else:
+                    hi = mid - 1
+            rounds.append(remaining[:lo])
+            remaining = remaining[lo:]
+        return rounds
+
+    @staticmethod
+    async def summarize_chat(client, chat_id: int, max_tokens: int = 4000, encoder: Optional[str] = None, mode: SummaryMode = SummaryMode.FAST) -> ChatSummary:
         """
         Возвращает summary (TL;DR), key points, важные сообщения и последние непрочитанные сообщения по чату.
-        Ограничение по токенам/сообщениям.
+        В режиме fast сразу отдаёт локальный экстрактивный summary (или готовую LLM-версию, если она
+        актуальна) и запускает LLM в фоне; llm ждёт ответа модели; extractive работает только локально.
         """
         import os
-        import tiktoken
-        from langchain_openai import ChatOpenAI
-        from trustcall import create_extractor
-        from ..schemas.telegram import ChatSummary, Message
 
-        # Получаем последние 200 сообщений (или меньше, если токенов много)
+        # Получаем последние 200 сообщений, от старых к новым
         messages = await TelegramRepository.get_messages(client, chat_id, limit=200)
-        # Сортируем по дате (от старых к новым)
         messages = sorted(messages, key=lambda m: m.date)
-        # Собираем текстовую переписку
-        conversation_lines = []
-        for m in messages:
-            text = getattr(m, 'text', None) or getattr(m, 'message', None)
-            if text:
-                sender = getattr(m.sender, 'first_name', None) or getattr(m.sender, 'username', None) or str(m.sender_id)
-                timestamp = m.date.strftime("%Y.%m.%d %H:%M")
-                conversation_lines.append(f"[{timestamp}] {sender}: {text}")
-        conversation = "\n".join(conversation_lines)
-
-        # Ограничение по токенам
-        enc = tiktoken.encoding_for_model("gpt-4o")
-        tokens = enc.encode(conversation)
-        if len(tokens) > max_tokens:
-            total_tokens = 0
-            selected_lines = []
-            for line in reversed(conversation_lines):
-                line_tokens = len(enc.encode(line))
-                if total_tokens + line_tokens > max_tokens:
-                    break
-                selected_lines.append(line)
-                total_tokens += line_tokens
-            conversation = "\n".join(reversed(selected_lines))
-
-        # Последние непрочитанные сообщения (до 10)
-        unread_msgs = [m for m in messages if getattr(m, 'unread', False)]
-        unread_msgs = unread_msgs[-10:] if unread_msgs else []
-        # Преобразуем в pydantic Message
-        from ..services.telegram import TelegramService
+        newest_id = max((m.id for m in messages), default=0)
+        unread_messages = await TelegramService._unread_messages(client, chat_id, messages)
+
+        key = TelegramService.summary_key(chat_id, max_tokens, encoder)
+        cached = TelegramService._summary_cache.get(key)
+        if mode != SummaryMode.EXTRACTIVE and cached and cached[0] == newest_id:
+            return cached[1].model_copy(update={"unread_messages": unread_messages})
+
+        if mode == SummaryMode.LLM:
+            summary = await TelegramService._llm_summary(client, chat_id, messages, max_tokens, encoder)
+            TelegramService._summary_cache[key] = (newest_id, summary)
+            return summary.model_copy(update={"unread_messages": unread_messages})
+
+        summary = await TelegramService._extractive_summary(client, chat_id, messages)
+        summary.unread_messages = unread_messages
+        if mode == SummaryMode.FAST and os.getenv("OPENAI_API_KEY"):
+            TelegramService._schedule_llm_summary(client, key, messages, encoder, newest_id)
+            summary.llm_pending = True
+        return summary
+
+    @staticmethod
+    def summary_key(chat_id: int, max_tokens: int = 4000, encoder: Optional[str] = None) -> Tuple[int, int, str]:
+        """Ключ кэша LLM-summary: версия с другим лимитом токенов или форматом промпта — другой ответ."""
+        return chat_id, max_tokens, get_prompt_encoder(encoder).name
+
+    @staticmethod
+    def _schedule_llm_summary(client, key: Tuple[int, int, str], messages, encoder: Optional[str], newest_id: int) -> None:
+        """Запускает LLM-summary в фоне (не более одной задачи на ключ кэша); результат попадает в кэш."""
+        import asyncio
+
+        chat_id, max_tokens, _ = key
+        task = TelegramService._summary_tasks.get(key)
+        if task and not task.done():
+            return
+
+        async def run():
+            try:
+                summary = await TelegramService._llm_summary(client, chat_id, messages, max_tokens, encoder)
+                TelegramService._summary_cache[key] = (newest_id, summary)
+            except Exception as e:
+                print(f"Background LLM summary for chat {chat_id} failed: {e}")
+
+        TelegramService._summary_tasks[key] = asyncio.create_task(run())
+
+    @staticmethod
+    async def _unread_messages(client, chat_id: int, messages) -> List[Message]:
+        """Последние непрочитанные сообщения (до 10) в виде pydantic Message."""
+        unread_msgs = [m for m in messages if getattr(m, 'unread', False)][-10:]
         unread_messages = [await TelegramService._convert_telethon_message(m, client, chat_id) for m in unread_msgs]
-        unread_messages = [m for m in unread_messages if m]
+        return [m for m in unread_messages if m]
+
+    @staticmethod
+    async def _extractive_summary(client, chat_id: int, messages) -> ChatSummary:
+        """Локальный summary: TF-IDF + TextRank, важные сообщения — с настоящими id и отправителями."""
+        from .dedup import deduplicate_messages
+        from .extractive import ExtractiveSummarizer
+
+        result = ExtractiveSummarizer.summarize(deduplicate_messages(messages))
+        by_id = {m.id: m for m in messages}
+        important_messages = [
+            await TelegramService._convert_telethon_message(by_id[message_id], client, chat_id)
+            for message_id in result.important_message_ids
+        ]
+        return ChatSummary(
+            summary=result.summary,
+            key_points=result.key_points,
+            important_messages=[m for m in important_messages if m],
+            unread_messages=[],
+            total_analyzed=result.total_analyzed,
+            source="extractive",
+        )
+
+    @staticmethod
+    def _match_quoted_message(quote: str, messages):
+        """Сообщение, которое LLM процитировала: точное вхождение или наибольшее пересечение слов (не меньше половины)."""
+        import re
+        quote_words = set(re.findall(r"\w+", quote.lower()))
+        if not quote_words:
+            return None
+        best, best_overlap = None, 0.5
+        for m in messages:
+            text = (getattr(m, 'message', None) or "").lower()
+            if not text:
+                continue
+            if quote.lower().strip() in text:
+                return m
+            overlap = len(quote_words & set(re.findall(r"\w+", text))) / len(quote_words)
+            if overlap > best_overlap:
+                best, best_overlap = m, overlap
+        return best
+
+    @staticmethod
+    async def _llm_summary(client, chat_id: int, messages, max_tokens: int = 4000, encoder: Optional[str] = None) -> ChatSummary:
+        """
+        Summary через LLM. Ограничение по токенам/сообщениям; формат переписки задаётся кодировщиком (encoder).
+        """
+        import os
+        from langchain_openai import ChatOpenAI
+
+        # Репосты и повторы одного и того же текста отправляем в LLM один раз
+        from .dedup import deduplicate_messages
+        # Собираем текстовую переписку в рамках бюджета токенов
+        prompt_encoder = get_prompt_encoder(encoder)
+        encoded = prompt_encoder.encode(deduplicate_messages(messages), max_tokens)
+        conversation = encoded.text
+        print(f"Summary prompt: {encoded.message_count} messages, {encoded.tokens} tokens ({encoded.tokens_saved} saved by '{prompt_encoder.name}' encoder)")
 
         # Настройка LLM
         api_key = os.getenv("OPENAI_API_KEY")
@@ -397,10 +567,11 @@ class TelegramService:
         llm = ChatOpenAI(model="gpt-4.1-mini", api_key=api_key)
         # Инструкция для LLM
         prompt = (
-            f"""Сделай краткое TL;DR (summary) по переписке, выдели ключевые моменты (key points, списком), и процитируй 3-5 самых важных сообщений (важные сообщения, с указанием автора и времени).\n\n<convo>\n{conversation}\n</convo>\nОтвет верни в формате JSON с ключами: summary, key_points (list), important_messages (list of dict: text, author, date)."""
+            f"""Сделай краткое TL;DR (summary) по переписке, выдели ключевые моменты (key points, списком), и процитируй 3-5 самых важных сообщений (важные сообщения, с указанием автора (полное имя, не алиас) и времени в формате ГГГГ.ММ.ДД ЧЧ:ММ).\n\n<convo>\n{conversation}\n</convo>\nОтвет верни в формате JSON с ключами: summary, key_points (list), important_messages (list of dict: text, author, date)."""
         )
-        # Вызов LLM
-        result = llm.invoke(prompt)
+        # Вызов LLM (асинхронно, чтобы фоновые задачи не блокировали event loop)
+        result = await llm.ainvoke(prompt)
+        LLMUsage.record(result)
         import json
         # Логируем результат LLM для диагностики
         print("LLM raw result.content:", repr(getattr(result, 'content', result)))
@@ -423,6 +594,13 @@ class TelegramService:
         important_messages = []
         from datetime import datetime
         for im in parsed.get("important_messages", []):
+            # Сопоставляем цитату с реальным сообщением, чтобы вернуть настоящие id и отправителя
+            matched = TelegramService._match_quoted_message(im.get("text") or "", messages)
+            if matched:
+                converted = await TelegramService._convert_telethon_message(matched, client, chat_id)
+                if converted:
+                    important_messages.append(converted)
+                    continue
             date_val = im.get("date", 0)
             if isinstance(date_val, str):
                 try:
@@ -445,6 +623,8 @@ class TelegramService:
             summary=parsed.get("summary", ""),
             key_points=parsed.get("key_points", []),
             important_messages=important_messages,
-            unread_messages=unread_messages,
-            total_analyzed=len(conversation_lines)
+            unread_messages=[],
+            total_analyzed=encoded.message_count,
+            prompt_tokens=encoded.tokens,
+            tokens_saved=encoded.tokens_saved
         )
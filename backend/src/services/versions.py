@@ -0,0 +1,124 @@
+"""
+Версии данных для условных GET.
+Счётчики меняются по событиям Telethon (новые, отредактированные, удалённые и прочитанные сообщения),
+поэтому ETag ответа считается и сверяется с If-None-Match без обращения к Telegram.
+"""
+import hashlib
+import time
+from typing import Dict, Optional, Tuple
+
+
+class VersionRegistry:
+    """
+    Версия списка диалогов и версии отдельных чатов: (id новейшего сообщения, счётчик правок, счётчик прочтений).
+    Версия чата появляется после первой полной выдачи его последних сообщений или первого нового сообщения;
+    до этого ETag для чата не выдаётся.
+    """
+    # Эпоха процесса: после перезапуска счётчики начинаются заново и не должны совпасть со старыми ETag
+    _epoch = format(time.time_ns(), "x")
+    _dialogs = 0
+    _chats: Dict[int, Tuple[int, int, int]] = {}
+    # Удаления в личных чатах и обычных группах приходят без chat_id и инвалидируют все чаты
+    _deletions = 0
+    _client = None
+
+    @staticmethod
+    def start(client) -> None:
+        """Подписывается на события, меняющие списки диалогов и сообщений (повторный вызов ничего не делает)."""
+        from telethon import events
+
+        if VersionRegistry._client is not None:
+            return
+        VersionRegistry._client = client
+        client.add_event_handler(VersionRegistry._on_new_message, events.NewMessage())
+        client.add_event_handler(VersionRegistry._on_edited, events.MessageEdited())
+        client.add_event_handler(VersionRegistry._on_deleted, events.MessageDeleted())
+        client.add_event_handler(VersionRegistry._on_read, events.MessageRead(inbox=True))
+        client.add_event_handler(VersionRegistry._on_read, events.MessageRead(inbox=False))
+        client.add_event_handler(VersionRegistry._on_chat_action, events.ChatAction())
+
+    @staticmethod
+    def stop() -> None:
+        client = VersionRegistry._client
+        if client is None:
+            return
+        for callback in (VersionRegistry._on_new_message, VersionRegistry._on_edited, VersionRegistry._on_deleted,
+                         VersionRegistry._on_read, VersionRegistry._on_chat_action):
+            client.remove_event_handler(callback)
+        VersionRegistry._client = None
+        # Пока события не отслеживаются, выданные ETag нельзя подтверждать
+        VersionRegistry._epoch = format(time.time_ns(), "x")
+        VersionRegistry._chats.clear()
+
+    # --- ETag ---
+    @staticmethod
+    def dialogs_etag(*params) -> Optional[str]:
+        """ETag списка диалогов с данными параметрами; None, если события не отслеживаются."""
+        if VersionRegistry._client is None:
+            return None
+        return VersionRegistry._etag(f"d{VersionRegistry._dialogs}", params)
+
+    @staticmethod
+    def chat_etag(chat_id: int, *params) -> Optional[str]:
+        """ETag выдачи по чату с данными параметрами; None, если версия чата ещё неизвестна."""
+        version = VersionRegistry._chats.get(chat_id)
+        if VersionRegistry._client is None or version is None:
+            return None
+        newest, edits, reads = version
+        return VersionRegistry._etag(f"c{chat_id}.{newest}.{edits}.{reads}.{VersionRegistry._deletions}", params)
+
+    @staticmethod
+    def observe_chat(chat_id: int, newest_id: int) -> None:
+        """Запоминает id новейшего сообщения чата, полученный из полной выдачи (если версия ещё не известна)."""
+        if VersionRegistry._client is not None:
+            VersionRegistry._chats.setdefault(chat_id, (newest_id, 0, 0))
+
+    @staticmethod
+    def not_modified(etag: Optional[str], if_none_match: Optional[str]) -> bool:
+        """Сравнение If-None-Match по RFC 9110: слабое, список через запятую или '*'."""
+        if not etag or not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in candidates
+
+    @staticmethod
+    def _etag(version: str, params: tuple) -> str:
+        digest = hashlib.blake2s(repr(params).encode(), digest_size=6).hexdigest()
+        return f'"{VersionRegistry._epoch}-{version}-{digest}"'
+
+    # --- События ---
+    @staticmethod
+    async def _on_new_message(event) -> None:
+        VersionRegistry._dialogs += 1
+        newest, edits, reads = VersionRegistry._chats.get(event.chat_id, (0, 0, 0))
+        VersionRegistry._chats[event.chat_id] = (max(newest, event.message.id), edits, reads)
+
+    @staticmethod
+    async def _on_edited(event) -> None:
+        VersionRegistry._dialogs += 1
+        VersionRegistry._bump(event.chat_id, edits=1)
+
+    @staticmethod
+    async def _on_deleted(event) -> None:
+        VersionRegistry._dialogs += 1
+        if event.chat_id is None:
+            VersionRegistry._deletions += 1
+        else:
+            VersionRegistry._bump(event.chat_id, edits=1)
+
+    @staticmethod
+    async def _on_read(event) -> None:
+        VersionRegistry._dialogs += 1
+        VersionRegistry._bump(event.chat_id, reads=1)
+
+    @staticmethod
+    async def _on_chat_action(event) -> None:
+        VersionRegistry._dialogs += 1
+
+    @staticmethod
+    def _bump(chat_id: Optional[int], edits: int = 0, reads: int = 0) -> None:
+        version = VersionRegistry._chats.get(chat_id)
+        if version is not None:
+            VersionRegistry._chats[chat_id] = (version[0], version[1] + edits, version[2] + reads)
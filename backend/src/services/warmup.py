@@ -0,0 +1,120 @@
+"""
+Прогрев после запуска.
+Первые запросы после рестарта не должны платить за импорт langchain_openai/trustcall/tiktoken,
+загрузку словаря токенизатора, get_me и холодную загрузку диалогов. Всё это делается в фоне
+после старта: сервер готов принимать запросы сразу, ход прогрева виден в /health.
+"""
+import asyncio
+import importlib
+import time
+from typing import List, Optional
+
+from ..core.config import WARMUP_ENABLED
+from ..schemas.health import HealthStatus, WarmupState, WarmupStatus, WarmupStep
+
+# Библиотеки, которые сервисы импортируют лениво внутри методов
+AI_MODULES = ("langchain_openai", "trustcall")
+DIALOGS_PREFETCH = 20
+
+
+class WarmupService:
+    """Фоновый прогрев и состояние готовности приложения."""
+    _ready = False
+    _started = time.monotonic()
+    _task: Optional[asyncio.Task] = None
+    _status = WarmupStatus(state=WarmupState.PENDING if WARMUP_ENABLED else WarmupState.DISABLED)
+
+    @staticmethod
+    def start(client=None) -> None:
+        """
+        Запускает прогрев в фоне и сразу возвращает управление.
+        :param client: Авторизованный клиент; без него шаги, требующие Telegram, пропускаются
+        """
+        WarmupService._ready = True
+        if not WARMUP_ENABLED or WarmupService._task is not None:
+            return
+        WarmupService._task = asyncio.create_task(WarmupService._run(client))
+
+    @staticmethod
+    async def stop() -> None:
+        WarmupService._ready = False
+        if WarmupService._task is None:
+            return
+        WarmupService._task.cancel()
+        await asyncio.gather(WarmupService._task, return_exceptions=True)
+        WarmupService._task = None
+
+    @staticmethod
+    def status(client) -> HealthStatus:
+        return HealthStatus(
+            ready=WarmupService._ready,
+            telegram_connected=client.is_connected(),
+            uptime_seconds=round(time.monotonic() - WarmupService._started, 3),
+            warmup=WarmupService._status,
+        )
+
+    @staticmethod
+    async def _run(client) -> None:
+        status = WarmupService._status
+        status.state = WarmupState.RUNNING
+        status.started_at = int(time.time())
+        started = time.monotonic()
+        # Импорты и токенизатор — CPU в отдельном потоке, запросы к Telegram — параллельно в event loop
+        await asyncio.gather(
+            WarmupService._chain([
+                ("ai_imports", lambda: asyncio.to_thread(WarmupService._import_ai_modules)),
+                ("tokenizer", lambda: asyncio.to_thread(WarmupService._load_tokenizer)),
+            ]),
+            WarmupService._chain([
+                ("telegram_me", lambda: WarmupService._telegram_me(client)),
+                ("dialogs", lambda: WarmupService._dialogs(client)),
+            ] if client is not None else [("telegram_me", None), ("dialogs", None)]),
+        )
+        status.total_seconds = round(time.monotonic() - started, 3)
+        status.state = WarmupState.DONE
+        print(f"Warm-up finished in {status.total_seconds}s: "
+              + ", ".join(f"{s.name}={s.seconds}s" for s in status.steps if s.ok))
+
+    @staticmethod
+    async def _chain(steps: List[tuple]) -> None:
+        """Шаги выполняются по очереди; ошибка шага записывается и не мешает следующим."""
+        for name, action in steps:
+            step = WarmupStep(name=name)
+            WarmupService._status.steps.append(step)
+            if action is None:
+                continue
+            started = time.monotonic()
+            try:
+                await action()
+                step.ok = True
+            except Exception as e:
+                step.ok = False
+                step.error = str(e)
+                print(f"Warm-up step '{name}' failed: {e}")
+            step.seconds = round(time.monotonic() - started, 3)
+
+    @staticmethod
+    def _import_ai_modules() -> None:
+        for module in AI_MODULES:
+            importlib.import_module(module)
+
+    @staticmethod
+    def _load_tokenizer() -> None:
+        from .prompt_encoder import get_encoding
+
+        get_encoding()
+
+    @staticmethod
+    async def _telegram_me(client) -> None:
+        from .telegram import TelegramService
+
+        await TelegramService.get_me(client)
+
+    @staticmethod
+    async def _dialogs(client) -> None:
+        """Первая страница чатов и статистика непрочитанных: заполняет кэш сущностей Telethon и кэш статистики."""
+        from .telegram import TelegramService
+        from ..schemas.telegram import ChatType
+
+        await TelegramService.get_chats(client, ChatType.ALL, DIALOGS_PREFETCH)
+        await TelegramService.get_chats_stats(client)
@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def fixture_path():
+    """Путь к файлу в tests/fixtures."""
+    return lambda *parts: os.path.join(FIXTURES, *parts)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Отдельная пустая SQLite-база на тест."""
+    from src.core import database
+
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.sqlite3"))
+    monkeypatch.setattr(database, "_connection", None)
+    yield database.get_connection()
+    database.get_connection().close()
@@ -0,0 +1,151 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.services import analytics
+from src.services.analytics import ChatAnalyticsService, ChatColumns
+
+CHAT = 1
+# 2024-05-13 (понедельник), 12:00 UTC
+NOW = datetime.datetime(2024, 5, 13, 12, 0, tzinfo=datetime.timezone.utc).timestamp()
+
+
+def message(id, minutes_ago, sender_id, text="", reply_to=None, **media):
+    return SimpleNamespace(
+        id=id,
+        date=datetime.datetime.fromtimestamp(NOW - minutes_ago * 60, tz=datetime.timezone.utc),
+        sender_id=sender_id,
+        sender=None,
+        message=text,
+        reply_to_msg_id=reply_to,
+        **media,
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(analytics.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def columns(monkeypatch):
+    monkeypatch.setattr(ChatAnalyticsService, "_columns", {})
+    monkeypatch.setattr(ChatAnalyticsService, "_aggregates", {})
+    columns = ChatColumns()
+    columns.append([
+        message(1, 60, 10, "привет"),
+        message(2, 50, 20, "привет!", reply_to=1),
+        message(3, 45, 10, "как дела?"),
+        message(4, 30, 20, photo=object()),
+        message(5, 20, 20, sticker=object()),
+    ])
+    columns.exhausted = True
+    ChatAnalyticsService._columns[CHAT] = columns
+    return columns
+
+
+def test_append_skips_known_ids_and_keeps_id_order():
+    columns = ChatColumns()
+    assert columns.append([message(3, 1, 1), message(1, 3, 1)]) == 2
+    assert columns.append([message(2, 2, 1), message(3, 1, 1)]) == 1
+    assert columns.ids.tolist() == [1, 2, 3]
+    assert columns.version == 2
+
+
+def test_compute_aggregates(columns, clock):
+    result = ChatAnalyticsService.compute(CHAT)
+
+    assert result.total_messages == 5
+    assert result.media_breakdown == {"text": 3, "sticker": 1, "photo": 1, "voice": 0, "document": 0}
+    assert sum(map(sum, result.heatmap)) == 5
+    # Понедельник, 11:00 UTC
+    assert result.heatmap[0][11] == 5
+    by_id = {s.sender_id: s for s in result.senders}
+    assert (by_id[10].message_count, by_id[20].message_count) == (2, 3)
+    assert by_id[20].reply_count == 1
+    # Ответы: 2 на 1 через 10 мин, 3 на 2 через 5 мин, 4 на 3 через 15 мин
+    assert by_id[20].median_response_seconds == 750.0
+    assert by_id[10].median_response_seconds == 300.0
+    assert result.trend.last_7_days == 5
+
+
+def test_compute_uses_only_last_history_limit_messages(columns, clock):
+    result = ChatAnalyticsService.compute(CHAT, history_limit=2)
+
+    assert result.total_messages == 2
+    assert {s.sender_id for s in result.senders} == {20}
+
+
+def test_compute_is_cached_until_columns_change(columns, clock):
+    first = ChatAnalyticsService.compute(CHAT)
+    assert ChatAnalyticsService.compute(CHAT) is first
+
+    columns.append([message(6, 10, 10, "ещё")])
+    assert ChatAnalyticsService.compute(CHAT).total_messages == 6
+
+
+def test_compute_cache_expires_on_day_change(columns, clock):
+    """Тренды отсчитываются от текущего дня: после его смены кэш по той же версии колонок недействителен."""
+    first = ChatAnalyticsService.compute(CHAT)
+    assert first.trend.daily[-1].date == "2024-05-13"
+
+    clock[0] += 3 * 86400
+    later = ChatAnalyticsService.compute(CHAT)
+    assert later is not first
+    assert later.trend.daily[-1].date == "2024-05-16"
+    assert later.trend.last_7_days == 5
+    assert later.trend.daily[-4].count == 5
+
+
+def test_local_day_uses_client_timezone(clock):
+    # 12:00 UTC — уже следующий день при UTC+14
+    assert ChatAnalyticsService.local_day(14 * 60) == ChatAnalyticsService.local_day(0) + 1
+    assert ChatAnalyticsService.local_day(-12 * 60) == ChatAnalyticsService.local_day(0)
+
+
+def test_group_medians_match_numpy():
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 5, 200)
+    values = rng.integers(0, 1000, 200)
+
+    medians = ChatAnalyticsService._group_medians(groups, values, 6)
+    for g in range(5):
+        assert medians[g] == np.median(values[groups == g])
+    assert np.isnan(medians[5])
+
+
+def test_for_prompt_without_history_uses_fetched_messages(monkeypatch, clock):
+    monkeypatch.setattr(ChatAnalyticsService, "_columns", {})
+    requests = []
+
+    async def get_messages(client, chat_id, limit, offset_id=0, min_id=0):
+        requests.append((limit, offset_id, min_id))
+        return []
+
+    monkeypatch.setattr(analytics.TelegramRepository, "get_messages", get_messages)
+    fetched = [message(7, 5, 10, "новое"), message(8, 1, 20, "ответ")]
+    result = asyncio.run(ChatAnalyticsService.for_prompt(None, CHAT, fetched))
+
+    assert requests == []
+    assert result.total_messages == 2
+    # Временные колонки не подменяют историю чата
+    assert CHAT not in ChatAnalyticsService._columns
+
+
+def test_for_prompt_with_history_fetches_only_newer(columns, monkeypatch, clock):
+    requests = []
+
+    async def get_messages(client, chat_id, limit, offset_id=0, min_id=0):
+        requests.append((offset_id, min_id))
+        return [message(6, 10, 10, "ещё")]
+
+    monkeypatch.setattr(analytics.TelegramRepository, "get_messages", get_messages)
+    result = asyncio.run(ChatAnalyticsService.for_prompt(None, CHAT, []))
+
+    assert requests == [(0, 5)]
+    assert result.total_messages == 6
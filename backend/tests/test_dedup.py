@@ -0,0 +1,60 @@
+import datetime
+from types import SimpleNamespace
+
+from src.services.dedup import NearDuplicateIndex, deduplicate_messages, minhash_signature
+
+POST = (
+    "Компания ищет Python-разработчика в команду платформы данных: FastAPI, PostgreSQL, Kafka, "
+    "удалённая работа, зарплата по итогам собеседования. Подробности https://jobs.example.com/123?utm_source=a"
+)
+REPOST = POST.replace("utm_source=a", "utm_source=b") + " Пишите в личку!"
+OTHER = (
+    "Сегодня в городе открылась новая выставка современного искусства, вход свободный до конца месяца, "
+    "экскурсии проходят по выходным в полдень."
+)
+
+
+def message(id, hours, text):
+    return SimpleNamespace(
+        id=id,
+        date=datetime.datetime(2024, 5, 13, tzinfo=datetime.timezone.utc) + datetime.timedelta(hours=hours),
+        message=text,
+    )
+
+
+def test_signature_ignores_case_and_url_tracking():
+    assert (minhash_signature(POST) == minhash_signature(POST.upper().replace("UTM_SOURCE=A", "utm=c"))).all()
+    assert minhash_signature("!!! ...") is None
+
+
+def test_index_clusters_reposts_within_window():
+    index = NearDuplicateIndex()
+    first = index.add("post", POST, 0)
+    repost = index.add("repost", REPOST, 3600)
+    other = index.add("other", OTHER, 7200)
+
+    assert not index.is_duplicate(first)
+    assert index.is_duplicate(repost)
+    assert not index.is_duplicate(other)
+    assert index.clusters() == [["post", "repost"], ["other"]]
+
+
+def test_index_keeps_copies_outside_window():
+    index = NearDuplicateIndex(window_seconds=3600)
+    index.add("post", POST, 0)
+    late = index.add("late", POST, 7200)
+
+    assert not index.is_duplicate(late)
+    assert len(index.clusters()) == 2
+
+
+def test_index_skips_items_without_text():
+    index = NearDuplicateIndex()
+    assert not index.is_duplicate(index.add("photo", None, 0))
+    assert not index.is_duplicate(index.add("photo", None, 0))
+    assert len(index) == 2
+
+
+def test_deduplicate_messages_keeps_earliest_copy_and_short_replies():
+    messages = [message(3, 2, REPOST), message(1, 0, POST), message(2, 1, "ок"), message(4, 3, "ок"), message(5, 4, OTHER)]
+    assert [m.id for m in deduplicate_messages(messages)] == [1, 2, 4, 5]
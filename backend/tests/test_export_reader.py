@@ -0,0 +1,115 @@
+import io
+import json
+
+import pytest
+
+from src.services.export_reader import JsonStream, TelegramExportReader, peer_id, sender_peer_id
+
+SAMPLE = '{"a": 12345, "b": [1, 2.5e10, -7, "x\\"y", true, null], "c": {}, "d": [], "e": {"f": "ж"}}'
+
+
+def read_object(stream: JsonStream) -> dict:
+    return {key: stream.value() for key in stream.items()}
+
+
+def read_export(file, chunk_size: int) -> list:
+    reader = TelegramExportReader(file, chunk_size)
+    return [(header, list(messages)) for header, messages in reader.chats()]
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+def test_json_stream_tiny_chunks(chunk_size):
+    stream = JsonStream(io.StringIO(SAMPLE), chunk_size)
+    assert read_object(stream) == json.loads(SAMPLE)
+    assert stream.peek() == ""
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+def test_json_stream_nested_iteration(chunk_size):
+    stream = JsonStream(io.StringIO(' [ {"id": 1}, {"id": 22} , {"id": 333} ] '), chunk_size)
+    ids = [stream.value()["id"] for _ in stream.elements()]
+    assert ids == [1, 22, 333]
+
+
+def test_json_stream_rejects_unexpected_token():
+    with pytest.raises(ValueError, match="Expected '\\{'"):
+        list(JsonStream(io.StringIO("[1]")).items())
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+def test_full_account_chats_at_tiny_chunks(fixture_path, chunk_size):
+    path = fixture_path("full_account", "result.json")
+    with open(path, encoding="utf-8") as file:
+        expected = json.load(file)
+    with open(path, encoding="utf-8") as file:
+        chats = read_export(file, chunk_size)
+
+    sections = [(chat, False) for chat in expected["chats"]["list"]]
+    sections += [(chat, True) for chat in expected["left_chats"]["list"]]
+    assert [header["id"] for header, _ in chats] == [chat["id"] for chat, _ in sections]
+    for (header, messages), (chat, left) in zip(chats, sections):
+        assert header["left"] is left
+        assert header["type"] == chat["type"]
+        assert messages == chat["messages"]
+
+
+def test_full_account_reads_personal_information(fixture_path):
+    with open(fixture_path("full_account", "result.json"), encoding="utf-8") as file:
+        reader = TelegramExportReader(file)
+        for _ in reader.chats():
+            pass
+    assert reader.account["user_id"] == 7000
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+def test_single_chat_at_tiny_chunks(fixture_path, chunk_size):
+    path = fixture_path("single_chat", "result.json")
+    with open(path, encoding="utf-8") as file:
+        expected = json.load(file)
+    with open(path, encoding="utf-8") as file:
+        chats = read_export(file, chunk_size)
+
+    assert len(chats) == 1
+    header, messages = chats[0]
+    assert (header["id"], header["type"], header["name"]) == (1234567890, "private_supergroup", "Книжный клуб")
+    assert messages == expected["messages"]
+
+
+def test_unread_messages_iterator_is_skipped(fixture_path):
+    with open(fixture_path("full_account", "result.json"), encoding="utf-8") as file:
+        ids = [header["id"] for header, _ in TelegramExportReader(file, 5).chats()]
+    assert ids == [4200, 1500, 550, 7000, 900]
+
+
+def test_messages_before_chat_id_are_rejected():
+    file = io.StringIO('{"name": "x", "messages": [], "id": 1, "type": "personal_chat"}')
+    with pytest.raises(ValueError, match="must precede 'messages'"):
+        list(TelegramExportReader(file).chats())
+
+
+@pytest.mark.parametrize("chat_type, raw_id, expected", [
+    ("personal_chat", 4200, 4200),
+    ("bot_chat", 93372553, 93372553),
+    ("saved_messages", 7000, 7000),
+    ("private_group", 550, -550),
+    ("public_supergroup", 900, -1000000000900),
+    ("private_supergroup", 1234567890, -1001234567890),
+    ("public_channel", 1500, -1000000001500),
+    ("private_channel", 1, -1000000000001),
+])
+def test_peer_id(chat_type, raw_id, expected):
+    assert peer_id(chat_type, raw_id) == expected
+
+
+@pytest.mark.parametrize("from_id, expected", [
+    ("user4200", 4200),
+    ("channel1500", -1000000001500),
+    ("chat550", -550),
+    (None, None),
+    ("", None),
+    ("user", None),
+    ("group12", None),
+    ("user12x", None),
+])
+def test_sender_peer_id(from_id, expected):
+    assert sender_peer_id(from_id) == expected
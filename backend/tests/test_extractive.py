@@ -0,0 +1,65 @@
+import datetime
+from types import SimpleNamespace
+
+from src.services.extractive import ExtractiveSummarizer, KEY_POINTS, SUMMARY_SENTENCES
+
+TEXTS = [
+    "Релиз мобильного приложения переносим на пятницу из-за ошибки оплаты.",
+    "Ошибка оплаты воспроизводится только на старых версиях Android.",
+    "Кто возьмёт исправление ошибки оплаты до пятницы?",
+    "Возьму исправление оплаты, к четвергу будет готово.",
+    "Отлично, тогда релиз приложения в пятницу утром.",
+    "Кстати, в столовой сегодня отличный борщ.",
+    "Да",
+]
+
+
+def messages():
+    start = datetime.datetime(2024, 5, 13, 9, 0, tzinfo=datetime.timezone.utc)
+    result = [
+        SimpleNamespace(id=i + 1, date=start + datetime.timedelta(minutes=i), message=text, text=text, reply_to_msg_id=None)
+        for i, text in enumerate(TEXTS)
+    ]
+    result[3].reply_to_msg_id = 3
+    result[4].reply_to_msg_id = 3
+    return result
+
+
+def test_summary_is_built_from_top_sentences_in_chronological_order():
+    result = ExtractiveSummarizer.summarize(list(reversed(messages())))
+
+    assert result.total_analyzed == len(TEXTS)
+    assert len(result.key_points) == KEY_POINTS
+    assert len(set(result.key_points)) == KEY_POINTS
+    sentences = [s for s in TEXTS if s in result.summary]
+    assert len(sentences) == SUMMARY_SENTENCES
+    # Предложения TL;DR идут в порядке переписки
+    assert result.summary == " ".join(sentences)
+    assert "Кстати, в столовой сегодня отличный борщ." not in result.key_points
+
+
+def test_important_messages_are_unique_and_ordered():
+    result = ExtractiveSummarizer.summarize(messages())
+
+    ids = result.important_message_ids
+    assert ids == sorted(set(ids))
+    # Одно слово не образует предложения для ранжирования
+    assert 7 not in ids
+    assert 3 in ids
+
+
+def test_empty_or_short_messages():
+    short = [SimpleNamespace(id=1, date=datetime.datetime(2024, 5, 13), message="ок", text="ок", reply_to_msg_id=None)]
+
+    result = ExtractiveSummarizer.summarize(short)
+    assert (result.summary, result.key_points, result.important_message_ids, result.total_analyzed) == ("", [], [], 1)
+    assert ExtractiveSummarizer.summarize([]).total_analyzed == 0
+
+
+def test_textrank_prefers_central_sentence():
+    import numpy as np
+
+    similarity = np.array([[0, 1, 1], [1, 0, 0], [1, 0, 0]], dtype=float)
+    scores = ExtractiveSummarizer._textrank(similarity)
+    assert scores.argmax() == 0
+    assert abs(scores.sum() - 1.0) < 1e-6
@@ -0,0 +1,111 @@
+import datetime
+import os
+
+import pytest
+
+from src.repositories.imports import ImportRepository
+from src.schemas.telegram import ChatType
+from src.services.importer import ImportService
+
+BOB = 4200
+CHANNEL = -1000000001500
+GROUP = -550
+SAVED = 7000
+LEFT_SUPERGROUP = -1000000000900
+BOOK_CLUB = -1001234567890
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("просто строка", "просто строка"),
+    (["Напомни ", {"type": "mention", "text": "@alice"}, " про ", {"type": "italic", "text": "билеты"}],
+     "Напомни @alice про билеты"),
+    ([{"type": "link", "text": "https://example.com"}], "https://example.com"),
+    ([{"type": "custom_emoji", "document_id": "1"}, "!"], "!"),
+    ([], ""),
+    (None, ""),
+])
+def test_text_flattens_entities(text, expected):
+    assert ImportService._text(text) == expected
+
+
+def test_full_account_row_counts(database, fixture_path):
+    result = ImportService.import_export(fixture_path("full_account", "result.json"))
+
+    assert result.chat_ids == [BOB, CHANNEL, GROUP, SAVED, LEFT_SUPERGROUP]
+    assert result.messages == 8
+    assert result.service_messages_skipped == 2
+    assert result.media_linked == 2
+    assert result.media_missing == 1
+    assert database.execute("SELECT COUNT(*) FROM imported_messages").fetchone()[0] == 8
+
+    chats = {chat.id: chat for chat in ImportRepository.chats()}
+    assert {chat_id: chats[chat_id].message_count for chat_id in result.chat_ids} == {
+        BOB: 5, CHANNEL: 1, GROUP: 1, SAVED: 0, LEFT_SUPERGROUP: 1,
+    }
+    assert chats[BOB].newest_message_id == 106
+    assert chats[CHANNEL].type == ChatType.CHANNEL
+    assert chats[LEFT_SUPERGROUP].type == ChatType.GROUP
+    assert chats[SAVED].name == "Saved Messages"
+
+
+def test_full_account_message_rows(database, fixture_path):
+    ImportService.import_export(fixture_path("full_account", "result.json"))
+    base_dir = os.path.dirname(os.path.abspath(fixture_path("full_account", "result.json")))
+
+    photo = ImportRepository.message(BOB, 102)
+    assert photo["media_type"] == "photo"
+    assert photo["media_path"] == os.path.join(base_dir, "photos", "photo_1@10-05-2024_18-02-30.jpg")
+    # Свой id берётся из personal_information
+    assert photo["from_author"] == 1
+
+    reply = ImportRepository.message(BOB, 104)
+    assert reply["text"] == "Класс! Напомни @alice про билеты"
+    assert reply["sender_id"] == BOB
+    assert reply["reply_to_msg_id"] == 102
+    assert reply["from_author"] == 0
+
+    document = ImportRepository.message(BOB, 105)
+    assert (document["media_type"], document["mime_type"]) == ("document", "application/pdf")
+    assert document["text"] is None
+
+    # "(File not included…)" не превращается в путь и считается отсутствующим файлом
+    sticker = ImportRepository.message(BOB, 106)
+    assert (sticker["media_type"], sticker["media_path"]) == ("sticker", None)
+    assert ImportService.to_message(sticker).media_url is None
+
+    post = ImportRepository.message(CHANNEL, 9001)
+    assert post["sender_id"] == CHANNEL
+    assert post["forwarded_from"] == "Агентство"
+
+    # В старых экспортах нет *_unixtime: дата читается как локальное время
+    dinner = ImportRepository.message(GROUP, 7)
+    assert dinner["date"] == int(datetime.datetime(2024, 5, 12, 12, 0).timestamp())
+
+
+def test_single_chat_export(database, fixture_path):
+    result = ImportService.import_export(fixture_path("single_chat", "result.json"), self_id=BOB)
+
+    assert result.chat_ids == [BOOK_CLUB]
+    assert result.messages == 3
+    assert result.service_messages_skipped == 1
+    assert (result.media_linked, result.media_missing) == (0, 1)
+
+    chat = ImportRepository.get_chat(BOOK_CLUB)
+    assert (chat.name, chat.type, chat.message_count, chat.newest_message_id) == ("Книжный клуб", ChatType.GROUP, 3, 4)
+
+    link = ImportRepository.message(BOOK_CLUB, 3)
+    assert link["text"] == "Отлично, встречаемся 15 марта, обсуждение тут: https://example.com/club"
+    assert link["from_author"] == 1
+
+    voice = ImportRepository.message(BOOK_CLUB, 4)
+    assert (voice["media_type"], voice["media_path"], voice["duration"]) == ("voice", None, 12)
+    assert voice["edited_at"] == 1709285460
+
+
+def test_reimport_replaces_rows(database, fixture_path):
+    path = fixture_path("single_chat", "result.json")
+    ImportService.import_export(path)
+    ImportService.import_export(path)
+
+    assert database.execute("SELECT COUNT(*) FROM imported_messages").fetchone()[0] == 3
+    assert len(ImportRepository.chats()) == 1
@@ -0,0 +1,99 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import prompt_encoder
+from src.services.prompt_encoder import CompactPromptEncoder, PromptEncoder, get_prompt_encoder
+
+START = datetime.datetime(2024, 5, 13, 9, 0, tzinfo=datetime.timezone.utc)
+
+
+def message(id, minutes, name, text, fwd_from=None):
+    return SimpleNamespace(
+        id=id,
+        date=START + datetime.timedelta(minutes=minutes),
+        sender_id=id,
+        sender=SimpleNamespace(first_name=name, username=None),
+        message=text,
+        text=text,
+        fwd_from=fwd_from,
+    )
+
+
+@pytest.fixture(autouse=True)
+def whitespace_tokens(monkeypatch):
+    """Токены считаются по словам: словарь tiktoken в тестах не загружается."""
+    monkeypatch.setattr(prompt_encoder, "get_encoding", lambda: SimpleNamespace(encode=str.split))
+
+
+def test_plain_render_is_one_line_per_message():
+    messages = [message(1, 0, "Алиса", "привет"), message(2, 3, "Боб", "здравствуй")]
+    assert PromptEncoder().render(messages) == "[2024.05.13 09:00] Алиса: привет\n[2024.05.13 09:03] Боб: здравствуй"
+
+
+def test_compact_render_collapses_and_shortens():
+    messages = [
+        message(1, 0, "Алиса", "смотри https://example.com/articles/very/long/path/to/some/page?utm=1"),
+        message(2, 2, "Алиса", "ещё раз https://example.com/articles/very/long/path/to/some/page?utm=1"),
+        message(3, 20, "Боб", "ок 😀😀😀😀😀"),
+        message(4, 24 * 60, "Алиса", "новый день"),
+    ]
+    lines = CompactPromptEncoder().render(messages).splitlines()
+
+    assert lines[0] == "Участники: A=Алиса; B=Боб"
+    assert lines[2:] == [
+        "## 2024.05.13",
+        "09:00 A: смотри example.com/articles/very/long/path/to/s…",
+        "  ещё раз [та же ссылка example.com]",
+        "+18м B: ок 😀😀😀",
+        "## 2024.05.14",
+        "09:00 A: новый день",
+    ]
+
+
+def test_compact_render_skips_repeated_forwards():
+    forward = SimpleNamespace()
+    messages = [
+        message(1, 0, "Алиса", "Новость дня", fwd_from=forward),
+        message(2, 1, "Боб", "новость  ДНЯ", fwd_from=forward),
+    ]
+    rendered = CompactPromptEncoder().render(messages)
+    assert rendered.count("[переслано]") == 1
+
+
+@pytest.mark.parametrize("encoder", [PromptEncoder(), CompactPromptEncoder()])
+def test_encode_drops_oldest_messages_to_fit_budget(encoder):
+    messages = [message(i, i * 90, "Алиса" if i % 2 else "Боб", f"сообщение номер {i}") for i in range(1, 21)]
+    full = encoder.encode(messages, 10_000)
+    budget = full.tokens // 2
+
+    encoded = encoder.encode(list(reversed(messages)), budget)
+    assert encoded.tokens <= budget
+    assert 0 < encoded.message_count < len(messages)
+    # Остаются самые новые сообщения, и ещё одно старое уже не помещается
+    kept = messages[-encoded.message_count:]
+    assert encoded.text == encoder.render(kept)
+    assert prompt_encoder.count_tokens(encoder.render(messages[-encoded.message_count - 1:])) > budget
+
+
+def test_tokens_saved_is_relative_to_plain_format():
+    messages = [message(i, i, "Алиса", f"строка {i}") for i in range(1, 41)]
+
+    plain = PromptEncoder().encode(messages, 10_000)
+    compact = CompactPromptEncoder().encode(messages, 10_000)
+    assert plain.tokens_saved == 0
+    assert compact.baseline_tokens == plain.tokens
+    assert compact.tokens_saved == plain.tokens - compact.tokens > 0
+
+
+def test_encode_skips_messages_without_text():
+    messages = [message(1, 0, "Алиса", "текст"), message(2, 1, "Боб", None)]
+    assert PromptEncoder().encode(messages, 100).message_count == 1
+
+
+def test_get_prompt_encoder():
+    assert get_prompt_encoder("plain").name == "plain"
+    assert get_prompt_encoder("compact").name == "compact"
+    with pytest.raises(ValueError, match="Unknown prompt encoder"):
+        get_prompt_encoder("zip")
@@ -64,6 +64,14 @@ const AIAssistant: React.FC<AIAssistantProps> = ({ chat, onClose }) => {
           console.log('Received summary response:', response);
           setChatSummaryData(response);
           setShowChatSummary(true);
+          if ('llm_pending' in response && response.llm_pending) {
+            // Локальный summary уже показан, LLM-версия подменит его, когда будет готова
+            TelegramApiService.waitForLlmSummary(chat.id).then(llmSummary => {
+              if (llmSummary) {
+                setChatSummaryData(llmSummary);
+              }
+            });
+          }
         } catch (err) {
           console.error('Error getting chat summary:', err);
           setChatSummaryError(err instanceof Error ? err.message : 'Failed to fetch chat summary');
@@ -165,8 +165,12 @@ const ChatView: React.FC<ChatViewProps> = ({ chat, currentUser }) => {
     }
   }, [chat]);
 
+  // Чат, для которого сейчас показывается summary: поздний ответ LLM для другого чата не применяется
+  const summaryChatIdRef = useRef<number | string | null>(null);
+
   // Reset summary state when chat changes
   useEffect(() => {
+    summaryChatIdRef.current = chat?.id ?? null;
     if (chat) {
       // Reset summary state when changing to a different chat
       setChatSummary(null);
@@ -274,6 +278,15 @@ const ChatView: React.FC<ChatViewProps> = ({ chat, currentUser }) => {
         }
         if (summaryObj) {
           setChatSummary(summaryObj);
+          if ('llm_pending' in response && response.llm_pending) {
+            // Пока показываем локальный summary, LLM-версия подменит его, когда будет готова
+            const chatId = chat.id;
+            TelegramApiService.waitForLlmSummary(chatId).then(llmSummary => {
+              if (llmSummary && summaryChatIdRef.current === chatId) {
+                setChatSummary(llmSummary);
+              }
+            });
+          }
         } else {
           throw new Error('Invalid summary response format');
         }
@@ -1,7 +1,10 @@
-import type { Chat, Message, ChatType, MessageFromAPI, UserProfileInsights, ChatSummaryResponse } from '../types/telegram';
+import type { Chat, Message, ChatType, MessageFromAPI, UserProfileInsights, ChatSummary, ChatSummaryResponse } from '../types/telegram';
 
 const API_BASE_URL = 'http://localhost:8000';
 const DEFAULT_MESSAGE_LIMIT = 15; // Added constant for message limit
+// Пока backend считает LLM-summary (llm_pending), запрос повторяется с этим интервалом
+const SUMMARY_POLL_INTERVAL_MS = 3000;
+const SUMMARY_POLL_ATTEMPTS = 20;
 
 interface ChatsResponse {
   chats: Chat[];
@@ -257,9 +260,10 @@ export class TelegramApiService {
       // Make direct API call first
       try {
         const apiUrl = `${API_BASE_URL}/telegram/chats/${chatId}/summary`;
-        console.log(`Direct API call to: ${apiUrl}?max_tokens=${maxTokens}`);
+        console.log(`Direct API call to: ${apiUrl}?max_tokens=${maxTokens}&mode=fast`);
         
-        const response = await fetch(`${apiUrl}?max_tokens=${maxTokens}`);
+        // fast: локальный summary сразу, LLM-версию забирает waitForLlmSummary
+        const response = await fetch(`${apiUrl}?max_tokens=${maxTokens}&mode=fast`);
         
         if (response.ok) {
           const data = await response.json();
@@ -279,7 +283,7 @@ export class TelegramApiService {
       try {
         // Try API again with chat type info
         const apiUrl = `${API_BASE_URL}/telegram/chats/${chatId}/summary`;
-        const response = await fetch(`${apiUrl}?max_tokens=${maxTokens}&type=${chat.type}`);
+        const response = await fetch(`${apiUrl}?max_tokens=${maxTokens}&mode=fast&type=${chat.type}`);
         
         if (response.ok) {
           const data = await response.json();
@@ -300,7 +304,36 @@ export class TelegramApiService {
       throw error;
     }
   }
-  
+
+  /**
+   * Повторяет запрос summary, пока backend считает LLM-версию (llm_pending)
+   * @param chatId ID чата
+   * @param maxTokens Тот же лимит, что и в первом запросе (LLM-версии кэшируются по нему)
+   * @returns LLM-summary или null, если она так и не была готова
+   */
+  static async waitForLlmSummary(
+    chatId: string | number,
+    maxTokens: number = 4000
+  ): Promise<ChatSummary | null> {
+    for (let attempt = 0; attempt < SUMMARY_POLL_ATTEMPTS; attempt++) {
+      await new Promise(resolve => setTimeout(resolve, SUMMARY_POLL_INTERVAL_MS));
+      try {
+        const response = await fetch(`${API_BASE_URL}/telegram/chats/${chatId}/summary?max_tokens=${maxTokens}&mode=fast`);
+        if (!response.ok) {
+          return null;
+        }
+        const data: ChatSummary = await response.json();
+        if (!data.llm_pending) {
+          return data;
+        }
+      } catch (error) {
+        console.warn('Polling for LLM summary failed:', error);
+        return null;
+      }
+    }
+    return null;
+  }
+
   /**
    * Получает AI-портрет (Persona Mirror) пользователя или собеседника
    * @param chatId ID чата
@@ -351,7 +384,9 @@ export class TelegramApiService {
         },
         learning_and_development_indicators: data.learning_and_development_indicators || [],
         values_and_motivators_hint: data.values_and_motivators_hint || [],
-        persona_mirror: data.persona_mirror || { persona_mirror: 'Психологический портрет недоступен' }
+        persona_mirror: data.persona_mirror || { persona_mirror: 'Психологический портрет недоступен' },
+        prompt_tokens: data.prompt_tokens ?? null,
+        tokens_saved: data.tokens_saved ?? null
       };
       
       return safeData;
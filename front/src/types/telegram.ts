@@ -98,6 +98,10 @@ export interface ChatSummary {
   }[];
   unread_messages: Message[];
   total_analyzed: number;
+  prompt_tokens?: number | null;
+  tokens_saved?: number | null;
+  // Локальный summary; LLM-версия ещё считается, повторный запрос вернёт её
+  llm_pending?: boolean;
 }
 
 export interface ChatSummaryResponse {
@@ -183,4 +187,7 @@ export interface UserProfileInsights {
   learning_and_development_indicators: LearningIndicator[];
   values_and_motivators_hint: ValueMotivator[];
   persona_mirror: PersonaMirror;
+  // Токены переписки в промптах этого обновления и экономия кодировщика; null, если профиль взят из сохранённого
+  prompt_tokens?: number | null;
+  tokens_saved?: number | null;
 }
\ No newline at end of file